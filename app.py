@@ -1,20 +1,46 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+# Startup is measured from here; see /api/health
+STARTUP_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from faster_whisper import WhisperModel
-import tempfile
+from flask_sock import Sock, ConnectionClosed
+from werkzeug.exceptions import HTTPException
 import os
 import datetime
+import functools
+import json
+import math
+import queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import threading
 import webbrowser
-import time
-import torch
+from whisper_models import (
+    MODEL_DIR, WHISPER_CPP_MODELS, get_available_models, get_model_file_size,
+    get_device_config, has_cuda, load_whisper_model
+)
+from model_cache import ModelCache, get_process_rss
+from worker_pool import TranscriptionPool, PoolFull
+from cpu_topology import tune as tune_cpu, current_affinity
+from jobs import JobStore, FINISHED_STATES
+from live import LiveSession
+from result_cache import ResultCache
+from transcript_store import TranscriptStore
+from long_audio import split_on_silence, transcribe_chunked
+from audio_io import UploadRequest, AudioDecodeError, decode_upload, decode_pcm, PCM_ENCODINGS, PCM_MIMETYPE, SAMPLE_RATE
+from pipeline import PreparePool, prepare_audio, model_options
+from recommender import ModelProfiles, Recommender, QUALITY_ORDER
+from decode_profiles import DECODE_PROFILES, AdaptiveDegrader
+from metrics import REGISTRY, CONTENT_TYPE, STAGE_SECONDS, REAL_TIME_FACTOR
 
 app = Flask(__name__, static_folder='frontend', static_url_path='')
+app.request_class = UploadRequest
+# Larger uploads get 413 from Content-Length (or while streaming a chunked
+# body) before anything is spooled
+MAX_UPLOAD_MB = int(os.environ.get('WHISPER_MAX_UPLOAD_MB', '512'))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
 CORS(app)
-
-# Set custom model directory
-MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
-os.makedirs(MODEL_DIR, exist_ok=True)
+sock = Sock(app)
 
 print(f"Model directory: {MODEL_DIR}")
 print("Letakkan model whisper.cpp (.bin) di folder models/")
@@ -23,121 +49,31 @@ print("Download dari: https://huggingface.co/ggerganov/whisper.cpp")
 # Global variables
 current_model = None
 current_model_name = "base"
-model_lock = threading.Lock()
-
-# Model info for whisper.cpp
-WHISPER_CPP_MODELS = {
-    "tiny": {
-        "file": "ggml-tiny.bin",
-        "size": "75 MB",
-        "speed": "~32x",
-        "quality": "Rendah",
-        "ram": "~390 MB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-tiny.bin"
-    },
-    "tiny.en": {
-        "file": "ggml-tiny.en.bin",
-        "size": "75 MB",
-        "speed": "~32x",
-        "quality": "Rendah (English)",
-        "ram": "~390 MB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-tiny.en.bin"
-    },
-    "base": {
-        "file": "ggml-base.bin",
-        "size": "142 MB",
-        "speed": "~16x",
-        "quality": "Baik",
-        "ram": "~500 MB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.bin"
-    },
-    "base.en": {
-        "file": "ggml-base.en.bin",
-        "size": "142 MB",
-        "speed": "~16x",
-        "quality": "Baik (English)",
-        "ram": "~500 MB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.en.bin"
-    },
-    "small": {
-        "file": "ggml-small.bin",
-        "size": "466 MB",
-        "speed": "~6x",
-        "quality": "Bagus",
-        "ram": "~1 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.bin"
-    },
-    "small.en": {
-        "file": "ggml-small.en.bin",
-        "size": "466 MB",
-        "speed": "~6x",
-        "quality": "Bagus (English)",
-        "ram": "~1 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.en.bin"
-    },
-    "medium": {
-        "file": "ggml-medium.bin",
-        "size": "1.5 GB",
-        "speed": "~2x",
-        "quality": "Sangat Bagus",
-        "ram": "~2.6 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.bin"
-    },
-    "medium.en": {
-        "file": "ggml-medium.en.bin",
-        "size": "1.5 GB",
-        "speed": "~2x",
-        "quality": "Sangat Bagus (English)",
-        "ram": "~2.6 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.en.bin"
-    },
-    "large-v1": {
-        "file": "ggml-large-v1.bin",
-        "size": "2.9 GB",
-        "speed": "~1x",
-        "quality": "Terbaik (v1)",
-        "ram": "~4.3 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v1.bin"
-    },
-    "large-v2": {
-        "file": "ggml-large-v2.bin",
-        "size": "2.9 GB",
-        "speed": "~1x",
-        "quality": "Terbaik (v2)",
-        "ram": "~4.3 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v2.bin"
-    },
-    "large-v3": {
-        "file": "ggml-large-v3.bin",
-        "size": "2.9 GB",
-        "speed": "~1x",
-        "quality": "Terbaik (v3)",
-        "ram": "~4.3 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v3.bin"
-    },
-    "large-v3-turbo": {
-        "file": "ggml-large-v3-turbo.bin",
-        "size": "1.6 GB",
-        "speed": "~2x",
-        "quality": "Terbaik (Turbo)",
-        "ram": "~3.0 GB",
-        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v3-turbo.bin"
-    }
-}
 
-def get_available_models():
-    """Check which models are available in models folder"""
-    available = []
-    for model_name, info in WHISPER_CPP_MODELS.items():
-        model_path = os.path.join(MODEL_DIR, info['file'])
-        if os.path.exists(model_path):
-            available.append(model_name)
-    return available
+# RAM budget for models kept resident at the same time, for the whole
+# server; every serve.py process loads its own models, so each gets a share
+MODEL_CACHE_BUDGET_MB = (int(os.environ.get('WHISPER_MODEL_CACHE_MB', '6144'))
+                         // max(1, int(os.environ.get('WHISPER_PROCESSES', '1'))))
 
-def get_recommended_model():
-    """Determine recommended model based on available RAM and GPU"""
+# Concurrent transcriptions; each model is loaded with this many
+# CTranslate2 workers (replicas) and the cores are split between them.
+# Tuned to the core count and NUMA layout for WHISPER_PROCESSES server
+# processes (set by serve.py) and kept in models/.cpu_tuning.json;
+# WHISPER_WORKERS / WHISPER_CPU_THREADS override the tuned values.
+cpu_tuning = tune_cpu(processes=int(os.environ.get('WHISPER_PROCESSES', '1')))
+TRANSCRIBE_WORKERS = int(os.environ.get('WHISPER_WORKERS', cpu_tuning['replicas']))
+CPU_THREADS = int(os.environ.get('WHISPER_CPU_THREADS', cpu_tuning['threads_per_replica']))
+TRANSCRIBE_QUEUE_SIZE = int(os.environ.get('WHISPER_QUEUE_SIZE', '32'))
+# Estimated processing seconds allowed to wait in the queue (0 = only the job count limits)
+QUEUE_MAX_SECONDS = float(os.environ.get('WHISPER_QUEUE_MAX_SECONDS', '1800'))
+
+# Longest a synchronous /api/transcribe waits for its result (0 = no limit)
+REQUEST_TIMEOUT = float(os.environ.get('WHISPER_REQUEST_TIMEOUT', '0'))
+
+def ladder_recommendation(available):
+    """RAM/GPU rule of thumb, used until a model has been measured on this host"""
     try:
-        has_gpu = torch.cuda.is_available()
+        has_gpu = has_cuda()
         
         try:
             import psutil
@@ -145,8 +81,7 @@ def get_recommended_model():
         except:
             available_ram_gb = 4
         
-        available = get_available_models()
-        
+
         if has_gpu:
             if 'large-v3' in available and available_ram_gb >= 8:
                 return "large-v3", "GPU + RAM tinggi"
@@ -177,102 +112,269 @@ def get_recommended_model():
         
         return None, "Tidak ada model tersedia"
     except:
-        available = get_available_models()
         return available[0] if available else None, "Model tersedia"
 
-def load_whisper_model(model_name):
-    """Load whisper model using faster-whisper"""
-    model_info = WHISPER_CPP_MODELS.get(model_name)
-    if not model_info:
-        raise ValueError(f"Model {model_name} tidak dikenal")
-    
-    model_path = os.path.join(MODEL_DIR, model_info['file'])
-    
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model {model_info['file']} tidak ditemukan di folder models/")
-    
-    # Determine device and compute type
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    compute_type = "float16" if device == "cuda" else "int8"
-    
-    print(f"Loading model from: {model_path}")
-    print(f"Device: {device}, Compute type: {compute_type}")
-    
-    # For faster-whisper, we use the model size name
-    model = WhisperModel(
-        model_name,
-        device=device,
-        compute_type=compute_type,
-        download_root=MODEL_DIR
-    )
+# Footprint and RTF measured per model on this host, kept across restarts
+MODEL_PROFILES_PATH = os.path.join(MODEL_DIR, '.profiles.json')
+model_profiles = ModelProfiles(MODEL_PROFILES_PATH)
+
+model_cache = ModelCache(
+    functools.partial(load_whisper_model, cpu_threads=CPU_THREADS, num_workers=TRANSCRIBE_WORKERS),
+    budget_bytes=MODEL_CACHE_BUDGET_MB * 1024 * 1024,
+    size_hint=get_model_file_size,
+    on_load=lambda key, footprint, seconds: model_profiles.record_load(*key, footprint, seconds)
+)
+
+def get_model(model_name):
+    """Get a resident model from the cache with the default device config"""
+    return model_cache.get(model_name, *get_device_config())
+
+# The two-pass draft model, pinned next to the default; changing the default
+# does not unpin it. Refine models are not pinned: they are loaded and
+# evicted within the cache budget like any other model.
+resident_models = set()
+# Guards resident_models and the pinning of the default and draft models
+resident_lock = threading.Lock()
+
+def keep_resident(model_name):
+    """Pin model_name as the draft model; it is loaded by the first job
+    that uses it. A previous draft model is unpinned unless it is the default."""
+    with resident_lock:
+        if model_name in resident_models:
+            return
+        model_cache.pin(model_name, *get_device_config())
+        for previous in resident_models:
+            if previous != current_model_name:
+                model_cache.unpin(previous, *get_device_config())
+        resident_models.clear()
+        resident_models.add(model_name)
+
+def set_default_model(model_name):
+    """Load model_name and make it the default, pinned in the cache"""
+    global current_model, current_model_name
     
+    model = get_model(model_name)
+    with resident_lock:
+        previous = current_model_name if current_model else None
+        model_cache.pin(model_name, *get_device_config())
+        current_model, current_model_name = model, model_name
+        # The old default stays loaded until its in-flight jobs have
+        # drained, after which it is evictable like any other entry
+        if previous and previous != model_name and previous not in resident_models:
+            model_cache.unpin(previous, *get_device_config())
     return model
 
-# Load initial model
-print("="*60)
-print("Checking available models...")
-available_models = get_available_models()
+transcription_pool = TranscriptionPool(
+    model_cache,
+    get_device_config,
+    size=TRANSCRIBE_WORKERS,
+    queue_size=TRANSCRIBE_QUEUE_SIZE,
+    max_queued_cost=QUEUE_MAX_SECONDS or None
+)
+transcription_pool.start()
+
+# Upload decoding and VAD run on these threads, ahead of the model workers
+PREPARE_WORKERS = int(os.environ.get('WHISPER_PREPARE_WORKERS', '2'))
+PREPARE_QUEUE_SIZE = int(os.environ.get('WHISPER_PREPARE_QUEUE_SIZE', TRANSCRIBE_QUEUE_SIZE))
+prepare_pool = PreparePool(size=PREPARE_WORKERS, queue_size=PREPARE_QUEUE_SIZE)
+prepare_pool.start()
+
+# Processing seconds per audio second the recommended model should stay within
+TARGET_RTF = float(os.environ.get('WHISPER_TARGET_RTF', '0.5'))
+
+def queued_per_worker():
+    stats = transcription_pool.stats()
+    return stats['queued'] / stats['workers']
+
+def queue_load_factor():
+    """Expected slowdown from jobs already waiting: 1 + queued per worker"""
+    return 1 + queued_per_worker()
+
+def free_memory():
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except Exception:
+        return None
+
+recommender = Recommender(
+    model_profiles,
+    get_device_config,
+    get_available_models,
+    size_hint=get_model_file_size,
+    is_loaded=model_cache.is_loaded,
+    load_factor=queue_load_factor,
+    free_memory=free_memory,
+    fallback=ladder_recommendation,
+    target_rtf=TARGET_RTF
+)
+
+def get_recommended_model():
+    """Last background recommendation as (model, reason)"""
+    current = recommender.current()
+    return current['model'], current['reason']
+
+def estimate_cost(audio_seconds, model_name):
+    """Expected processing seconds, from the model's measured RTF on this host"""
+    profile = model_profiles.get(model_name, *get_device_config()) or {}
+    return audio_seconds * profile.get('rtf', 1.0)
+
+def request_client():
+    """Who a request counts against for fair scheduling"""
+    return request.headers.get('X-Client-Id') or request.remote_addr
+
+def busy_response(error):
+    response = jsonify({'error': f'Server sedang sibuk: {error}', 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({'error': f'File terlalu besar (maksimal {MAX_UPLOAD_MB} MB)'}), 413
+
+# Measured load time per model, used for the ETA while loading
+LOAD_TIMES_PATH = os.path.join(MODEL_DIR, '.load_times.json')
+
+def read_load_times():
+    try:
+        with open(LOAD_TIMES_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_load_time(model_name, seconds):
+    load_times = read_load_times()
+    load_times[model_name] = round(seconds, 2)
+    try:
+        with open(LOAD_TIMES_PATH, 'w') as f:
+            json.dump(load_times, f)
+    except OSError:
+        pass
+
+# State of the initial model load, reported by /api/health
+loading_state = {'state': 'idle', 'model': None, 'started_at': None, 'eta_seconds': None}
+startup_seconds = {'import': None, 'model_ready': None}
+loading_started = threading.Lock()
+
+def load_default_model(model_name):
+    loading_state.update(state='loading', model=model_name, started_at=time.perf_counter(),
+                         eta_seconds=read_load_times().get(model_name))
+    started = time.perf_counter()
+    set_default_model(model_name)
+    record_load_time(model_name, time.perf_counter() - started)
 
-if available_models:
-    print(f"Models tersedia: {', '.join(available_models)}")
-    recommended_model, reason = get_recommended_model()
+def load_initial_model():
+    """Pick and load the default model; runs on a background thread"""
+    print("="*60)
+    print("Checking available models...")
+    available_models = get_available_models()
+    
+    if available_models:
+        print(f"Models tersedia: {', '.join(available_models)}")
+        recommended_model, reason = get_recommended_model()
+        
+        if recommended_model:
+            print(f"Recommended model: {recommended_model} ({reason})")
+            try:
+                load_default_model(recommended_model)
+                print(f"Model {recommended_model} berhasil dimuat!")
+            except Exception as e:
+                print(f"Error loading recommended model: {e}")
+                # Try loading first available model
+                for model_name in available_models:
+                    try:
+                        load_default_model(model_name)
+                        print(f"Loaded fallback model: {model_name}")
+                        break
+                    except:
+                        continue
+    else:
+        print("PERINGATAN: Tidak ada model ditemukan di folder models/")
+        print("="*60)
+        print("Cara mendapatkan model whisper.cpp:")
+        print("1. Download dari: https://huggingface.co/ggerganov/whisper.cpp/tree/main")
+        print("2. Atau gunakan script download otomatis (lihat README)")
+        print("3. Letakkan file .bin di folder models/")
+        print("="*60)
+        print("Contoh file model:")
+        for name, info in WHISPER_CPP_MODELS.items():
+            print(f"  - {info['file']} ({info['size']}) untuk model {name}")
+        print("="*60)
+        print("\n💡 Download cepat dengan script:")
+        print("  python download_models.py base")
+        print("  python download_models.py small")
+        print("  python download_models.py large-v2")
+        print("="*60)
     
-    if recommended_model:
-        print(f"Recommended model: {recommended_model} ({reason})")
+    if current_model:
+        loading_state['state'] = 'ready'
+        startup_seconds['model_ready'] = round(time.perf_counter() - STARTUP_STARTED, 2)
+        print(f"Model siap {startup_seconds['model_ready']}s setelah start")
+    else:
+        loading_state['state'] = 'no_model'
+    if TWO_PASS_DEFAULT and draft_model_name():
+        # Loaded up front so the first draft is as fast as the rest
         try:
-            current_model = load_whisper_model(recommended_model)
-            current_model_name = recommended_model
-            print(f"Model {recommended_model} berhasil dimuat!")
+            get_model(draft_model_name())
+            keep_resident(draft_model_name())
         except Exception as e:
-            print(f"Error loading recommended model: {e}")
-            # Try loading first available model
-            for model_name in available_models:
-                try:
-                    current_model = load_whisper_model(model_name)
-                    current_model_name = model_name
-                    print(f"Loaded fallback model: {model_name}")
-                    break
-                except:
-                    continue
-else:
-    print("PERINGATAN: Tidak ada model ditemukan di folder models/")
-    print("="*60)
-    print("Cara mendapatkan model whisper.cpp:")
-    print("1. Download dari: https://huggingface.co/ggerganov/whisper.cpp/tree/main")
-    print("2. Atau gunakan script download otomatis (lihat README)")
-    print("3. Letakkan file .bin di folder models/")
-    print("="*60)
-    print("Contoh file model:")
-    for name, info in WHISPER_CPP_MODELS.items():
-        print(f"  - {info['file']} ({info['size']}) untuk model {name}")
-    print("="*60)
-    print("\n💡 Download cepat dengan script:")
-    print("  python download_models.py base")
-    print("  python download_models.py small")
-    print("  python download_models.py large-v2")
-    print("="*60)
+            print(f"Error loading draft model: {e}")
+    recommender.start()
+
+def start_background_loading():
+    """Start loading the default model once, without blocking the server"""
+    if not loading_started.acquire(blocking=False):
+        return
+    threading.Thread(target=load_initial_model, name='model-loader', daemon=True).start()
+
+@app.before_request
+def ensure_model_loading():
+    # Covers servers that import the app without running __main__
+    start_background_loading()
+
+def model_not_ready():
+    """Error response while the default model is unavailable, else None"""
+    if current_model:
+        return None
+    if loading_state['state'] in ('idle', 'loading'):
+        eta = loading_eta()
+        response = jsonify({'error': 'Model sedang dimuat, coba lagi sebentar', 'eta_seconds': eta})
+        response.headers['Retry-After'] = str(max(1, int(eta or 1)))
+        return response, 503
+    return jsonify({'error': 'Model belum dimuat. Pastikan ada model di folder models/'}), 500
+
+def loading_eta():
+    if loading_state['state'] != 'loading' or loading_state['eta_seconds'] is None:
+        return None
+    elapsed = time.perf_counter() - loading_state['started_at']
+    return round(max(0.0, loading_state['eta_seconds'] - elapsed), 1)
 
 @app.route('/api/models', methods=['GET'])
 def get_models():
-    available = get_available_models()
-    recommended, reason = get_recommended_model() if available else (None, "Tidak ada model")
+    # Served from the background recommender; no disk or psutil calls here
+    recommendation = recommender.current()
+    available = recommendation['available']
+    recommended = recommendation['model'] if available else None
     
     return jsonify({
         "models": WHISPER_CPP_MODELS,
+        "profiles": DECODE_PROFILES,
+        "default_profile": DEFAULT_DECODE_PROFILE,
         "current": current_model_name if current_model else None,
         "available": available,
         "recommended": {
             "model": recommended,
-            "reason": reason
+            "reason": recommendation['reason'],
+            "target_rtf": recommendation['target_rtf'],
+            "load_factor": recommendation['load_factor'],
+            "candidates": recommendation['candidates']
         } if recommended else None,
-        "has_gpu": torch.cuda.is_available(),
+        "has_gpu": has_cuda(),
         "model_dir": MODEL_DIR
     })
 
 @app.route('/api/change-model', methods=['POST'])
 def change_model():
-    global current_model, current_model_name
-    
     data = request.json
     model_name = data.get('model')
     
@@ -283,100 +385,872 @@ def change_model():
         return jsonify({'error': f'Model {model_name} tidak tersedia. Download dulu model .bin nya'}), 400
     
     try:
-        with model_lock:
-            print(f"Changing model to: {model_name}")
-            current_model = load_whisper_model(model_name)
-            current_model_name = model_name
-            print(f"Model {model_name} loaded successfully!")
+        # Jobs already queued or running keep the model they were
+        # submitted with; only new requests use the new default
+        print(f"Changing model to: {model_name}")
+        previous = current_model_name
+        set_default_model(model_name)
+        print(f"Model {model_name} loaded successfully!")
         
         return jsonify({
             'success': True,
             'model': model_name,
+            'draining': transcription_pool.in_flight(previous) if previous != model_name else 0,
             'message': f'Model berhasil diubah ke {model_name}'
         })
     except Exception as e:
         print(f"Error loading model: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-# Global progress tracking
-transcription_progress = {"progress": 0, "stage": "idle"}
+# Finished jobs are kept this long for /api/jobs/<id>
+JOB_TTL_SECONDS = int(os.environ.get('WHISPER_JOB_TTL', '600'))
+# Set when several server processes must see each other's jobs
+JOBS_SHARED_DIR = os.environ.get('WHISPER_JOBS_DIR') or None
+jobs = JobStore(ttl_seconds=JOB_TTL_SECONDS, shared_dir=JOBS_SHARED_DIR)
+
+def get_request_model():
+    """Optional per-request model, served from the cache without changing the global default"""
+    model_name = request.values.get('model') or current_model_name
+    if model_name not in WHISPER_CPP_MODELS:
+        return None, (jsonify({'error': 'Model tidak valid'}), 400)
+    if model_name != current_model_name and model_name not in get_available_models():
+        return None, (jsonify({'error': f'Model {model_name} tidak tersedia. Download dulu model .bin nya'}), 400)
+    return model_name, None
+
+# Decode profile used when the request does not pick one (?profile=)
+DEFAULT_DECODE_PROFILE = os.environ.get('WHISPER_DECODE_PROFILE', 'accurate')
+# Adaptive mode for requests that do not set ?adaptive=
+ADAPTIVE_DEFAULT = os.environ.get('WHISPER_ADAPTIVE') == '1'
+# Job latency (queue + decode) above which adaptive mode steps down
+ADAPTIVE_P95_SECONDS = float(os.environ.get('WHISPER_ADAPTIVE_P95_SECONDS', '30'))
+degrader = AdaptiveDegrader(load_factor=queued_per_worker, p95_target=ADAPTIVE_P95_SECONDS)
+
+def smaller_loaded_model(model_name):
+    """Nearest lower-quality model that is already resident, else model_name"""
+    if model_name not in QUALITY_ORDER:
+        return model_name
+    for name in reversed(QUALITY_ORDER[:QUALITY_ORDER.index(model_name)]):
+        if model_cache.is_loaded(name, *get_device_config()):
+            return name
+    return model_name
+
+def get_request_decode():
+    """Model and decode profile for this request: (model_name, profile, degraded, error).
+    
+    In adaptive mode the profile steps down while the server is saturated,
+    and at the lowest level so does the model, unless ?model= pins it.
+    """
+    model_name, error = get_request_model()
+    if error:
+        return None, None, False, error
+    requested = request.values.get('profile') or DEFAULT_DECODE_PROFILE
+    if requested not in DECODE_PROFILES:
+        return None, None, False, (jsonify({'error': f"Profil tidak valid (pilih {', '.join(DECODE_PROFILES)})"}), 400)
+    
+    adaptive = request.values.get('adaptive')
+    if not (adaptive in ('1', 'true') or (adaptive is None and ADAPTIVE_DEFAULT)):
+        return model_name, requested, False, None
+    
+    profile, step_model_down = degrader.choose(requested)
+    chosen_model = model_name
+    if step_model_down and not request.values.get('model'):
+        chosen_model = smaller_loaded_model(model_name)
+    return chosen_model, profile, (profile, chosen_model) != (requested, model_name), None
+
+def read_upload(audio_file):
+    """Decode the uploaded file from memory (or its spill file) to a float32 array"""
+    # On the prepare pool, so the number of concurrent decodes is bounded
+    # no matter how many requests are uploading
+    audio, container = prepare_pool.submit(decode_upload, audio_file.stream).result()
+    print(f"Upload: {container or 'format tidak dikenal'}, {len(audio) / SAMPLE_RATE:.1f}s audio")
+    return audio
+
+def read_request_audio():
+    """Audio from the request: a raw PCM body, or a multipart 'audio' file
+    that is either PCM or an encoded container. None if there is no audio.
+    """
+    # Reading the body (or parsing the form) is the upload stage
+    started = time.perf_counter()
+    if request.mimetype == PCM_MIMETYPE:
+        data = request.get_data(cache=False)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='upload')
+        with STAGE_SECONDS.time(stage='decode'):
+            return decode_pcm(data, request.mimetype_params)
+    
+    if 'audio' not in request.files:
+        return None
+    audio_file = request.files['audio']
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage='upload')
+    with STAGE_SECONDS.time(stage='decode'):
+        if audio_file.mimetype == PCM_MIMETYPE:
+            return decode_pcm(audio_file.read(), audio_file.mimetype_params)
+        return read_upload(audio_file)
+
+def check_upload_admission(model_name):
+    """Raise PoolFull before the upload is read if the queue is already full,
+    so rejected requests cost neither the upload nor the decode.
+    
+    Only raw PCM tells its duration by Content-Length; encoded uploads count
+    as zero cost here. The exact cost is checked once the audio is decoded.
+    """
+    seconds = 0.0
+    if request.mimetype == PCM_MIMETYPE and request.content_length:
+        dtype = PCM_ENCODINGS.get(request.mimetype_params.get('encoding', 's16le'))
+        if dtype is not None:
+            seconds = request.content_length / dtype.itemsize / SAMPLE_RATE
+    transcription_pool.check_admission(estimate_cost(seconds, model_name))
+
+# Results of previous transcriptions, keyed by audio content and settings
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'results')
+RESULT_CACHE_MB = int(os.environ.get('WHISPER_RESULT_CACHE_MB', '512'))
+RESULT_CACHE_TTL = int(os.environ.get('WHISPER_RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+result_cache = ResultCache(
+    RESULT_CACHE_DIR,
+    max_bytes=RESULT_CACHE_MB * 1024 * 1024,
+    ttl_seconds=RESULT_CACHE_TTL
+)
+
+def submit_prepared(model_name, audio, options, fn, cost=0.0, client=None):
+    """Queue fn(model, prepared) for `audio`, running VAD on the prepare pool
+    while the job waits for a model worker; returns the job's Future"""
+    transcription_pool.check_admission(cost)
+    prepared = prepare_pool.submit(prepare_audio, audio, options)
+    try:
+        future = transcription_pool.submit(
+            model_name, lambda model: fn(model, prepared.result()),
+            cost=cost, client=client, ready=prepared.done
+        )
+    except PoolFull:
+        prepared.cancel()
+        raise
+    # A cancelled job no longer needs its audio prepared
+    future.add_done_callback(lambda f: prepared.cancel() if f.cancelled() else None)
+    return future
+
+# Every finished transcription, searchable via /api/transcripts/search
+TRANSCRIPTS_DB = os.environ.get(
+    'WHISPER_TRANSCRIPTS_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'transcripts.db')
+)
+transcripts = TranscriptStore(TRANSCRIPTS_DB)
+transcripts.start()
+
+def transcribe_with_progress(model, prepared, model_name, job_id, profile, on_segment=None):
+    """Transcribe prepared audio and report the decoded position as job progress"""
+    jobs.update(job_id, status='running', stage='Transkripsi dengan Whisper...',
+                audio_duration=round(prepared.duration, 2))
+    duration = prepared.duration
+    
+    # transcribe() runs feature extraction up front (VAD already ran on
+    # the prepare pool); the returned generator is the model decode
+    started = time.perf_counter()
+    segments, info = model.transcribe(prepared.audio, **model_options(DECODE_PROFILES[profile]))
+    features_done = time.perf_counter()
+    STAGE_SECONDS.observe(features_done - started, stage='features')
+    
+    # faster-whisper returns a lazy generator, so the segments
+    # must be consumed on the worker that holds the model
+    collected = []
+    for segment in prepared.restore(segments):
+        collected.append({
+            'start': round(segment.start, 2),
+            'end': round(segment.end, 2),
+            'text': segment.text.strip(),
+            'avg_logprob': round(segment.avg_logprob, 3)
+        })
+        progress = int(segment.end * 100 / duration) if duration else 0
+        jobs.update(job_id, progress=min(progress, 99), processed_seconds=round(segment.end, 2))
+        if on_segment:
+            on_segment(collected[-1])
+    
+    finished = time.perf_counter()
+    STAGE_SECONDS.observe(finished - features_done, stage='model')
+    if duration:
+        rtf = (finished - started) / duration
+        REAL_TIME_FACTOR.observe(rtf, model=model_name)
+        model_profiles.record_rtf(model_name, *get_device_config(), rtf)
+    return build_result(collected, info.language, duration, model_name, profile)
+
+def transcript_confidence(segments):
+    """Mean token probability over the segments, weighted by segment
+    length; None when there is nothing to judge"""
+    scored = [(max(s['end'] - s['start'], 0.01), s['avg_logprob'])
+              for s in segments if s.get('avg_logprob') is not None]
+    if not scored:
+        return None
+    total = sum(length for length, _ in scored)
+    return round(sum(length * math.exp(logprob) for length, logprob in scored) / total, 3)
+
+def build_result(segments, language, duration, model_name, profile):
+    return {
+        'transcription': " ".join(s['text'] for s in segments),
+        'segments': segments,
+        'language': language,
+        'duration': round(duration, 2),
+        'model_used': model_name,
+        'profile': profile,
+        'confidence': transcript_confidence(segments),
+        'timestamp': datetime.datetime.now().isoformat()
+    }
+
+# Audio longer than this is split at silences and the chunks are decoded
+# in parallel on the worker pool
+LONG_AUDIO_SECONDS = float(os.environ.get('WHISPER_LONG_AUDIO_SECONDS', '300'))
+LONG_AUDIO_CHUNK_SECONDS = float(os.environ.get('WHISPER_LONG_AUDIO_CHUNK_SECONDS', '120'))
+LONG_AUDIO_PARALLELISM = int(os.environ.get('WHISPER_LONG_AUDIO_PARALLELISM', TRANSCRIBE_WORKERS))
+# Longest a long-audio job waits for queue room when none of its chunks run
+LONG_AUDIO_QUEUE_SECONDS = float(os.environ.get('WHISPER_LONG_AUDIO_QUEUE_SECONDS', '120'))
+
+def long_decode_options(profile):
+    # Chunks are decoded without the sampling fallback so the stitched
+    # result is the same on every run
+    return {**DECODE_PROFILES[profile], 'temperature': 0.0}
+
+def transcribe_long(audio, model_name, job_id, profile, on_segment=None, client=None):
+    """Transcribe long audio chunk-parallel; returns a Future of the result"""
+    future = Future()
+    duration = len(audio) / SAMPLE_RATE
+    options = long_decode_options(profile)
+    
+    def run_chunk(model, prepared):
+        with STAGE_SECONDS.time(stage='features'):
+            segments, _ = model.transcribe(prepared.audio, **model_options(options))
+        with STAGE_SECONDS.time(stage='model'):
+            return [
+                {'start': s.start, 'end': s.end, 'text': s.text.strip(), 'avg_logprob': round(s.avg_logprob, 3)}
+                for s in prepared.restore(segments)
+            ]
+    
+    def submit_chunk(chunk):
+        return submit_prepared(
+            model_name, chunk, options, run_chunk,
+            cost=estimate_cost(len(chunk) / SAMPLE_RATE, model_name),
+            client=client
+        )
+    
+    def on_progress(done_seconds, total_seconds):
+        jobs.update(
+            job_id,
+            progress=min(int(done_seconds * 100 / total_seconds), 99),
+            processed_seconds=round(done_seconds, 2)
+        )
+    
+    def orchestrate():
+        started = time.perf_counter()
+        try:
+            jobs.update(job_id, status='running', stage='Memotong audio di bagian hening...',
+                        audio_duration=round(duration, 2))
+            chunks = split_on_silence(audio, LONG_AUDIO_CHUNK_SECONDS)
+            print(f"Long audio: {duration:.0f}s dalam {len(chunks)} bagian, paralel {LONG_AUDIO_PARALLELISM}")
+            jobs.update(job_id, stage='Transkripsi paralel dengan Whisper...', chunks=len(chunks))
+            
+            segments = transcribe_chunked(
+                audio, chunks, submit_chunk, LONG_AUDIO_PARALLELISM,
+                on_segment=on_segment,
+                on_progress=on_progress,
+                cancel_chunk=transcription_pool.cancel,
+                queue_timeout=LONG_AUDIO_QUEUE_SECONDS,
+                cancelled=future.cancelled
+            )
+            # Wall-clock RTF of the whole job, chunks decoded in parallel
+            REAL_TIME_FACTOR.observe((time.perf_counter() - started) / duration, model=model_name)
+            future.set_result(build_result(segments, options['language'], duration, model_name, profile))
+        except Exception as e:
+            # A cancelled job has nobody left to tell
+            if not future.cancelled():
+                future.set_exception(e)
+    
+    # The orchestrator only waits on chunk futures, so it must not occupy
+    # a pool worker itself
+    threading.Thread(target=orchestrate, name=f"long-{job_id[:8]}", daemon=True).start()
+    return future
+
+def submit_transcription(audio, model_name, on_segment=None, long_audio=None, profile=None, client=None,
+                         pass_name=None):
+    """Queue a transcription job for decoded audio, returning (job_id, future).
+    
+    Identical audio with identical settings is served from the result
+    cache, or waits on the decode already running for it. long_audio
+    forces chunk-parallel mode on or off; by default it is used above
+    LONG_AUDIO_SECONDS. client is the fair-scheduling group. pass_name
+    ('draft' or 'refine') is recorded on the job and its result.
+    Decoded results are also added to the transcript history.
+    """
+    profile = profile or DEFAULT_DECODE_PROFILE
+    if long_audio is None:
+        long_audio = len(audio) / SAMPLE_RATE > LONG_AUDIO_SECONDS
+    
+    pass_fields = {'pass': pass_name} if pass_name else {}
+    job = jobs.create(model=model_name, profile=profile, **pass_fields)
+    job_id = job['id']
+    submitted = time.perf_counter()
+    
+    def finish(future, decoded=False):
+        degrader.record_latency(time.perf_counter() - submitted)
+        try:
+            result = {**future.result(), **pass_fields}
+            jobs.update(job_id, status='done', progress=100, stage='Selesai!', result=result)
+            # Cache hits and coalesced waiters would only add duplicates
+            if decoded:
+                transcripts.record(job_id, audio_hash, result)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            jobs.update(job_id, status='error', stage='Gagal', error=str(e))
+    
+    if long_audio:
+        settings = {**long_decode_options(profile), 'chunk_seconds': LONG_AUDIO_CHUNK_SECONDS}
+    else:
+        settings = DECODE_PROFILES[profile]
+    device, compute_type = get_device_config()
+    audio_hash = ResultCache.audio_hash(audio)
+    cache_key = ResultCache.make_key(audio_hash, {'model': model_name, 'device': device,
+                                                  'compute_type': compute_type, **settings})
+    status, value = result_cache.begin(cache_key)
+    if status == 'hit':
+        # A new response: stamped now, with the original decode time kept apart
+        future = Future()
+        future.set_result({**value, 'cached': True, 'cached_at': value.get('timestamp'),
+                           'timestamp': datetime.datetime.now().isoformat()})
+        finish(future)
+        return job_id, future
+    if status == 'coalesced':
+        jobs.update(job_id, stage='Menunggu transkripsi yang sama...')
+        value.add_done_callback(finish)
+        return job_id, value
+    
+    def run(model, prepared):
+        return transcribe_with_progress(model, prepared, model_name, job_id, profile, on_segment)
+    
+    cost = estimate_cost(len(audio) / SAMPLE_RATE, model_name)
+    try:
+        if long_audio:
+            # Chunks are queued one by one later; admit the whole job now
+            transcription_pool.check_admission(cost)
+            future = transcribe_long(audio, model_name, job_id, profile, on_segment, client)
+        else:
+            future = submit_prepared(model_name, audio, DECODE_PROFILES[profile], run, cost=cost, client=client)
+    except PoolFull as e:
+        result_cache.abandon(cache_key, e)
+        jobs.update(job_id, status='error', stage='Gagal', error=str(e))
+        raise
+    future.add_done_callback(lambda f: result_cache.complete(cache_key, f))
+    future.add_done_callback(functools.partial(finish, decoded=True))
+    return job_id, future
+
+def wants_long_audio():
+    """?long=1 / long=0 forces chunk-parallel mode; unset means automatic"""
+    value = request.values.get('long')
+    if value is None:
+        return None
+    return value in ('1', 'true')
+
+def wants_stream():
+    """Clients opt into NDJSON streaming with ?stream=1 or the Accept header"""
+    return (request.args.get('stream') in ('1', 'true')
+            or 'application/x-ndjson' in request.headers.get('Accept', ''))
+
+def stream_transcription(audio, model_name, long_audio=None, profile=None, degraded=False,
+                         pass_name=None, on_done=None):
+    """Queue a job and stream each segment as an NDJSON line as soon as it is decoded.
+    
+    on_done(result) may return extra fields for the final line.
+    """
+    segment_queue = queue.Queue()
+    job_id, future = submit_transcription(audio, model_name, on_segment=segment_queue.put,
+                                          long_audio=long_audio, profile=profile,
+                                          client=request_client(), pass_name=pass_name)
+    pass_fields = {'pass': pass_name} if pass_name else {}
+    # Runs after the job finishes, successfully or not
+    future.add_done_callback(lambda f: segment_queue.put(None))
+    
+    def generate():
+        yield json.dumps({'type': 'job', 'job_id': job_id, 'model_used': model_name,
+                          'profile': profile, 'degraded': degraded, **pass_fields}) + "\n"
+        streamed = 0
+        while True:
+            segment = segment_queue.get()
+            if segment is None:
+                break
+            streamed += 1
+            yield json.dumps({'type': 'segment', **segment}) + "\n"
+        try:
+            result = dict(future.result())
+            # Cached or coalesced results arrive all at once
+            for segment in result.pop('segments')[streamed:]:
+                yield json.dumps({'type': 'segment', **segment}) + "\n"
+            extra = on_done(result) if on_done else {}
+            yield json.dumps({'type': 'done', 'success': True, 'job_id': job_id, **result,
+                              'degraded': degraded, **pass_fields, **extra}) + "\n"
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Two-pass mode (?two_pass=1): a small model answers right away and the
+# requested model re-transcribes in the background
+TWO_PASS_DEFAULT = os.environ.get('WHISPER_TWO_PASS') == '1'
+# Draft model; by default base, or tiny when base is not downloaded
+DRAFT_MODEL = os.environ.get('WHISPER_DRAFT_MODEL') or None
+DRAFT_PROFILE = os.environ.get('WHISPER_DRAFT_PROFILE', 'fast')
+# Drafts at least this confident (mean token probability) are not refined
+DRAFT_CONFIDENCE = float(os.environ.get('WHISPER_DRAFT_CONFIDENCE', '0.8'))
+
+def wants_two_pass():
+    value = request.values.get('two_pass')
+    if value is None:
+        return TWO_PASS_DEFAULT
+    return value in ('1', 'true')
+
+def draft_model_name():
+    if DRAFT_MODEL:
+        return DRAFT_MODEL
+    available = get_available_models()
+    return next((name for name in ('base', 'tiny') if name in available), None)
+
+def timeout_response(job_id):
+    # The job keeps running; its result stays available via /api/jobs
+    return jsonify({
+        'error': 'Transkripsi melebihi batas waktu request',
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }), 504
+
+def transcribe_two_pass(audio, draft_name, refine_name, long_audio, profile, degraded):
+    """Answer with a draft from the small model, then refine with the
+    requested one unless the draft is already confident.
+    
+    The refined result is delivered through the refine job's events_url
+    (or status_url); each result carries 'pass': 'draft' or 'refine'.
+    """
+    # The draft model stays loaded so drafts never wait for a model load;
+    # the refine model is whatever the request asked for and goes through
+    # the cache like a normal request
+    keep_resident(draft_name)
+    client = request_client()
+    
+    def refine(draft):
+        confidence = draft.get('confidence')
+        if confidence is not None and confidence >= DRAFT_CONFIDENCE:
+            return {'status': 'skipped', 'reason': f'Confidence draft {confidence:.2f} sudah cukup'}
+        try:
+            job_id, _ = submit_transcription(audio, refine_name, long_audio=long_audio, profile=profile,
+                                             client=client, pass_name='refine')
+        except PoolFull as e:
+            return {'status': 'skipped', 'reason': f'Server sedang sibuk: {e}'}
+        return {
+            'status': 'queued',
+            'job_id': job_id,
+            'model': refine_name,
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events'
+        }
+    
+    if wants_stream():
+        return stream_transcription(audio, draft_name, long_audio, DRAFT_PROFILE, degraded,
+                                    pass_name='draft', on_done=lambda result: {'refine': refine(result)})
+    
+    job_id, future = submit_transcription(audio, draft_name, long_audio=long_audio, profile=DRAFT_PROFILE,
+                                          client=client, pass_name='draft')
+    try:
+        draft = future.result(timeout=REQUEST_TIMEOUT or None)
+    except FutureTimeoutError:
+        return timeout_response(job_id)
+    
+    with STAGE_SECONDS.time(stage='serialize'):
+        return jsonify({'success': True, 'job_id': job_id, **draft, 'pass': 'draft',
+                        'degraded': degraded, 'refine': refine(draft)})
 
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe_audio():
-    global transcription_progress
-    
-    if not current_model:
-        return jsonify({'error': 'Model belum dimuat. Pastikan ada model di folder models/'}), 500
+    not_ready = model_not_ready()
+    if not_ready:
+        return not_ready
     
     try:
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        audio_file = request.files['audio']
+        model_name, profile, degraded, error = get_request_decode()
+        if error:
+            return error
         
-        transcription_progress = {"progress": 10, "stage": "Menyimpan file audio..."}
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp:
-            audio_file.save(tmp.name)
-            tmp_path = tmp.name
+        check_upload_admission(model_name)
+        audio = read_request_audio()
+        if audio is None:
+            return jsonify({'error': 'No audio file provided'}), 400
+        print(f"Transcribing audio with model: {model_name}, profile: {profile}")
+        if wants_two_pass():
+            draft_name = draft_model_name()
+            if draft_name and draft_name != model_name:
+                return transcribe_two_pass(audio, draft_name, model_name, wants_long_audio(), profile, degraded)
+        if wants_stream():
+            return stream_transcription(audio, model_name, wants_long_audio(), profile, degraded)
         
+        job_id, future = submit_transcription(audio, model_name, long_audio=wants_long_audio(),
+                                              profile=profile, client=request_client())
         try:
-            print(f"Transcribing audio with model: {current_model_name}")
-            
-            transcription_progress = {"progress": 30, "stage": "Memproses audio..."}
-            
-            with model_lock:
-                transcription_progress = {"progress": 50, "stage": "Transkripsi dengan Whisper..."}
-                
-                # faster-whisper returns segments, not a dict
-                segments, info = current_model.transcribe(
-                    tmp_path,
-                    language='id',
-                    beam_size=5,
-                    vad_filter=True
-                )
-                
-                transcription_progress = {"progress": 75, "stage": "Mengumpulkan hasil..."}
-                
-                # Collect all segments
-                transcription = ""
-                for segment in segments:
-                    transcription += segment.text + " "
-                
-                transcription = transcription.strip()
-            
-            transcription_progress = {"progress": 100, "stage": "Selesai!"}
-            
-            return jsonify({
-                'success': True,
-                'transcription': transcription,
-                'language': 'id',
-                'model_used': current_model_name,
-                'timestamp': datetime.datetime.now().isoformat()
-            })
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            transcription_progress = {"progress": 0, "stage": "idle"}
-                
+            result = future.result(timeout=REQUEST_TIMEOUT or None)
+        except FutureTimeoutError:
+            return timeout_response(job_id)
+        
+        with STAGE_SECONDS.time(stage='serialize'):
+            return jsonify({'success': True, 'job_id': job_id, **result, 'degraded': degraded})
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 415
+    except PoolFull as e:
+        return busy_response(e)
+    except HTTPException:
+        # e.g. 413 from MAX_CONTENT_LENGTH, handled by its error handler
+        raise
     except Exception as e:
         print(f"Error: {str(e)}")
-        transcription_progress = {"progress": 0, "stage": "idle"}
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    not_ready = model_not_ready()
+    if not_ready:
+        return not_ready
+    
+    model_name, profile, degraded, error = get_request_decode()
+    if error:
+        return error
+    
+    try:
+        check_upload_admission(model_name)
+        audio = read_request_audio()
+        if audio is None:
+            return jsonify({'error': 'No audio file provided'}), 400
+        job_id, _ = submit_transcription(audio, model_name, long_audio=wants_long_audio(),
+                                         profile=profile, client=request_client())
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 415
+    except PoolFull as e:
+        return busy_response(e)
+    
+    return jsonify({
+        'job_id': job_id,
+        'model': model_name,
+        'profile': profile,
+        'degraded': degraded,
+        'status_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events'
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job tidak ditemukan'}), 404
+    with STAGE_SECONDS.time(stage='serialize'):
+        return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events stream of job updates until it finishes"""
+    if not jobs.get(job_id):
+        return jsonify({'error': 'Job tidak ditemukan'}), 404
+    
+    def generate():
+        version = -1
+        while True:
+            job = jobs.wait(job_id, version, timeout=15)
+            if job is None:
+                yield 'event: error\ndata: {"error": "Job tidak ditemukan"}\n\n'
+                return
+            if job['version'] == version:
+                yield ': keepalive\n\n'
+                continue
+            version = job['version']
+            yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in FINISHED_STATES:
+                return
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Largest page /api/transcripts/search returns
+SEARCH_MAX_LIMIT = 100
+
+def parse_time(value):
+    """Epoch seconds, or an ISO date / datetime in server local time"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/transcripts/search', methods=['GET'])
+def search_transcripts():
+    """Keyword and time-range search over the transcript history.
+    
+    ?q= keywords ("..." for a phrase, kata* for a prefix), ?from= / ?to=
+    (epoch seconds or ISO date), ?model=, ?limit=, and ?cursor= with the
+    next_cursor of the previous page.
+    """
+    try:
+        since = parse_time(request.args.get('from'))
+        until = parse_time(request.args.get('to'))
+        limit = min(max(int(request.args.get('limit', 20)), 1), SEARCH_MAX_LIMIT)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Parameter from, to, limit atau cursor tidak valid'}), 400
+    
+    started = time.perf_counter()
+    results, next_cursor = transcripts.search(
+        request.args.get('q'), since=since, until=until,
+        model=request.args.get('model'), limit=limit, cursor=cursor
+    )
+    return jsonify({
+        'results': results,
+        'next_cursor': next_cursor,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/api/transcripts/<int:transcript_id>', methods=['GET'])
+def get_transcript(transcript_id):
+    transcript = transcripts.get(transcript_id)
+    if not transcript:
+        return jsonify({'error': 'Transkrip tidak ditemukan'}), 404
+    return jsonify(transcript)
+
 @app.route('/api/progress', methods=['GET'])
 def get_progress():
-    return jsonify(transcription_progress)
+    job_id = request.args.get('job')
+    job = jobs.get(job_id) if job_id else jobs.latest_active()
+    if not job:
+        return jsonify({"progress": 0, "stage": "idle"})
+    return jsonify({"progress": job['progress'], "stage": job['stage'], "job_id": job['id']})
+
+# How long the final step of a live session may wait for room in the queue
+LIVE_FINAL_QUEUE_SECONDS = 30.0
+
+@sock.route('/ws/live')
+def live_transcribe(ws):
+    """Live transcription of MediaRecorder timeslices sent while recording.
+    
+    Text messages are control: {"type": "start", "model": ...} then
+    {"type": "stop"}. Binary messages are audio. The server sends "partial"
+    and "final" hypotheses, then "done" after stop.
+    
+    The handler blocks on the socket. A step is started when audio arrives
+    and when the previous step finishes, so an idle session costs nothing.
+    """
+    session = None
+    # Guards `step` and the session, and keeps messages in order: step
+    # results are sent from pool worker threads
+    cond = threading.Condition(threading.RLock())
+    step = None
+    stopping = False
+    
+    def send(message):
+        with cond:
+            ws.send(json.dumps(message))
+    
+    def submit_step(final):
+        nonlocal step
+        window = session.window()
+        if window is None:
+            return None
+        audio, prompt = window
+        step = transcription_pool.submit(
+            session.model_name,
+            lambda model: session.decode(model, audio, prompt),
+            lane='live',
+            cost=estimate_cost(len(audio) / SAMPLE_RATE, session.model_name),
+            client=id(session)
+        )
+        return step
+    
+    def apply_step(future, final):
+        try:
+            for message in session.apply(future.result(), final):
+                send(message)
+        except ConnectionClosed:
+            raise
+        except Exception as e:
+            send({'type': 'error', 'error': str(e)})
+    
+    def next_step():
+        # One step in flight per session; a full queue just retries on the
+        # next audio message or step
+        with cond:
+            if step is None and not stopping and session.ready():
+                try:
+                    future = submit_step(final=False)
+                except PoolFull:
+                    return
+                if future:
+                    future.add_done_callback(step_done)
+    
+    def step_done(future):
+        nonlocal step
+        try:
+            with cond:
+                step = None
+                if not future.cancelled():
+                    apply_step(future, final=False)
+                cond.notify_all()
+            next_step()
+        except ConnectionClosed:
+            pass
+    
+    def final_step():
+        """Wait out the running step, then decode what is left"""
+        with cond:
+            cond.wait_for(lambda: step is None)
+        deadline = time.monotonic() + LIVE_FINAL_QUEUE_SECONDS
+        while True:
+            with cond:
+                try:
+                    future = submit_step(final=True)
+                    break
+                except PoolFull as e:
+                    if time.monotonic() >= deadline:
+                        send({'type': 'error', 'error': f'Server sedang sibuk: {e}'})
+                        return
+            time.sleep(0.5)
+        if future:
+            future.exception()
+            with cond:
+                apply_step(future, final=True)
+    
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, str):
+                try:
+                    data = json.loads(message)
+                    kind = data.get('type')
+                except (ValueError, AttributeError):
+                    send({'type': 'error', 'error': 'Pesan kontrol tidak valid'})
+                    continue
+                if kind == 'start' and session is None:
+                    model_name = data.get('model') or current_model_name
+                    if model_name not in get_available_models():
+                        send({'type': 'error', 'error': 'Model tidak valid'})
+                        break
+                    session = LiveSession(model_name, language=data.get('language') or 'id')
+                    send({'type': 'started', 'model': model_name})
+                elif kind == 'stop':
+                    if session is not None:
+                        with cond:
+                            stopping = True
+                        session.finish()
+                        # Undecodable audio (or a decoder that did not
+                        # finish) ends the session with an error
+                        if session.error():
+                            send({'type': 'error', 'error': session.error()})
+                        else:
+                            final_step()
+                    break
+            elif session is not None:
+                session.feed(message)
+                if session.error():
+                    send({'type': 'error', 'error': session.error()})
+                    break
+                next_step()
+        
+        send({'type': 'done', 'text': session.text() if session else ''})
+    except ConnectionClosed:
+        pass
+    finally:
+        if session:
+            with cond:
+                stopping = True
+                if step is not None:
+                    transcription_pool.cancel(step)
+            session.close()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    if current_model:
+        status = 'ok'
+    elif loading_state['state'] in ('idle', 'loading'):
+        status = 'loading'
+    else:
+        status = 'no_model'
+    with resident_lock:
+        resident = sorted(resident_models)
+    
     return jsonify({
-        'status': 'ok' if current_model else 'no_model',
+        'status': status,
         'model': current_model_name if current_model else None,
-        'gpu_available': torch.cuda.is_available(),
-        'available_models': get_available_models()
+        'loading': {
+            'model': loading_state['model'],
+            'eta_seconds': loading_eta()
+        } if status == 'loading' else None,
+        'startup_seconds': startup_seconds,
+        'gpu_available': has_cuda(),
+        'available_models': get_available_models(),
+        'model_cache': model_cache.stats(),
+        'workers': transcription_pool.stats(),
+        'prepare': prepare_pool.stats(),
+        'cpu': {
+            'replicas': TRANSCRIBE_WORKERS,
+            'threads_per_replica': CPU_THREADS,
+            'overridden': 'WHISPER_WORKERS' in os.environ or 'WHISPER_CPU_THREADS' in os.environ,
+            'tuning': {key: cpu_tuning[key] for key in (
+                'source', 'processes', 'replicas', 'threads_per_replica', 'logical_cpus',
+                'physical_cores', 'numa_nodes', 'slots', 'tuned_at'
+            )},
+            'affinity': current_affinity()
+        },
+        'jobs': jobs.stats(),
+        'result_cache': result_cache.stats(),
+        'transcripts': transcripts.stats(),
+        'decode': {
+            'default_profile': DEFAULT_DECODE_PROFILE,
+            'adaptive_default': ADAPTIVE_DEFAULT,
+            **degrader.stats()
+        },
+        'two_pass': {
+            'default': TWO_PASS_DEFAULT,
+            'draft_model': draft_model_name(),
+            'draft_profile': DRAFT_PROFILE,
+            'draft_confidence': DRAFT_CONFIDENCE,
+            'resident': resident
+        }
     })
 
+# Read at scrape time, so they cost nothing between scrapes
+REGISTRY.collected(
+    'whisper_queue_depth', 'Jobs waiting for a worker, per lane',
+    lambda: {
+        **{(lane,): count for lane, count in transcription_pool.stats()['lanes'].items()},
+        ('prepare',): prepare_pool.stats()['queued']
+    },
+    labelnames=('lane',)
+)
+REGISTRY.collected(
+    'whisper_jobs_running', 'Transcriptions running, per model',
+    lambda: {(name,): count for name, count in transcription_pool.stats()['running'].items()},
+    labelnames=('model',)
+)
+REGISTRY.collected(
+    'whisper_models_resident_bytes', 'Measured footprint of loaded models',
+    lambda: model_cache.stats()['used_bytes']
+)
+REGISTRY.collected(
+    'whisper_result_cache_lookups_total', 'Result cache lookups by outcome',
+    lambda: {(outcome,): result_cache.stats()[outcome] for outcome in ('hits', 'misses', 'coalesced')},
+    labelnames=('result',),
+    kind='counter'
+)
+REGISTRY.collected(
+    'whisper_adaptive_level', 'Adaptive decode step-down level (0 = as requested)',
+    lambda: degrader.level
+)
+REGISTRY.collected('process_resident_memory_bytes', 'Resident memory size in bytes', get_process_rss)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text format; each server process reports its own"""
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
 @app.route('/')
 def serve_index():
     return send_from_directory(app.static_folder, 'index.html')
@@ -385,21 +1259,27 @@ def open_browser():
     time.sleep(1.5)
     webbrowser.open('http://localhost:5000')
 
+startup_seconds['import'] = round(time.perf_counter() - STARTUP_STARTED, 2)
+
 if __name__ == '__main__':
     print("="*60)
     print("WHISPER SPEECH TO TEXT - WHISPER.CPP VERSION")
     print("="*60)
     print(f"Model directory: {MODEL_DIR}")
-    if current_model:
-        print(f"Current model: {current_model_name}")
-        print(f"GPU Available: {torch.cuda.is_available()}")
-    else:
-        print("PERINGATAN: Tidak ada model yang dimuat!")
+    print(f"GPU Available: {has_cuda()}")
+    print("Model dimuat di background, status di /api/health")
+    print(f"Startup: {startup_seconds['import']}s sampai server siap")
     print("="*60)
     print("Starting server on http://localhost:5000")
     print("Press Ctrl+C to stop the server")
     print("="*60)
     
-    threading.Thread(target=open_browser, daemon=True).start()
+    # With debug=True the reloader runs this module twice: a watcher process
+    # and the serving child (WERKZEUG_RUN_MAIN=true). Only the child loads
+    # models; only the watcher opens the browser, so reloads do not.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_loading()
+    else:
+        threading.Thread(target=open_browser, daemon=True).start()
     
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,110 @@
+import os
+import tempfile
+
+import numpy as np
+from flask import Request
+
+SAMPLE_RATE = 16000
+
+# Uploads up to this size stay in memory; larger ones spill to a temp file
+SPILL_THRESHOLD_BYTES = int(os.environ.get('WHISPER_SPILL_MB', '32')) * 1024 * 1024
+
+# (offset, magic bytes, container name)
+CONTAINER_SIGNATURES = [
+    (0, b'\x1a\x45\xdf\xa3', 'webm'),
+    (0, b'OggS', 'ogg'),
+    (0, b'fLaC', 'flac'),
+    (0, b'ID3', 'mp3'),
+    (0, b'\xff\xfb', 'mp3'),
+    (0, b'\xff\xf3', 'mp3'),
+    (0, b'\xff\xf2', 'mp3'),
+    (0, b'\xff\xf1', 'aac'),
+    (0, b'\xff\xf9', 'aac'),
+    (0, b'#!AMR', 'amr'),
+    (4, b'ftyp', 'mp4'),
+]
+
+
+# Raw PCM uploads: Content-Type audio/pcm;rate=16000;encoding=<name>
+PCM_MIMETYPE = 'audio/pcm'
+PCM_ENCODINGS = {
+    's16le': np.dtype('<i2'),
+    'f16le': np.dtype('<f2'),
+    'f32le': np.dtype('<f4'),
+}
+
+
+class AudioDecodeError(Exception):
+    """Raised when an upload cannot be decoded as audio"""
+
+
+class UploadRequest(Request):
+    """Request that keeps uploads in memory below SPILL_THRESHOLD_BYTES.
+
+    Werkzeug's default spools anything above 500 KB to disk, which sends
+    almost every recording through the filesystem.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=SPILL_THRESHOLD_BYTES, mode='rb+')
+
+
+def sniff_container(head):
+    """Identify the audio container from its first bytes, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    for offset, magic, name in CONTAINER_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return name
+    return None
+
+
+def decode_upload(stream):
+    """Decode a file-like upload straight to a 16 kHz mono float32 array.
+
+    Returns (audio, container).
+    """
+    from faster_whisper.audio import decode_audio
+
+    head = stream.read(16)
+    stream.seek(0)
+    container = sniff_container(head)
+
+    try:
+        audio = decode_audio(stream, sampling_rate=SAMPLE_RATE)
+    except Exception as e:
+        raise AudioDecodeError(f"Format audio tidak didukung ({container or 'tidak dikenal'}): {e}")
+    return audio, container
+
+
+def _pcm_int(params, name, default):
+    value = params.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise AudioDecodeError(f"Parameter PCM {name} tidak valid: {value!r}")
+
+
+def decode_pcm(data, params):
+    """Turn a raw 16 kHz mono PCM body into the model input without a decoder.
+
+    The samples are a NumPy view over the request bytes; f32le is used as-is
+    and the other encodings take a single conversion pass to float32.
+    """
+    encoding = params.get('encoding', 's16le')
+    dtype = PCM_ENCODINGS.get(encoding)
+    if dtype is None:
+        raise AudioDecodeError(f"Encoding PCM tidak didukung: {encoding} (pilih {', '.join(PCM_ENCODINGS)})")
+    if _pcm_int(params, 'rate', SAMPLE_RATE) != SAMPLE_RATE:
+        raise AudioDecodeError(f"PCM harus {SAMPLE_RATE} Hz, resample di client")
+    if _pcm_int(params, 'channels', 1) != 1:
+        raise AudioDecodeError("PCM harus mono")
+
+    usable = len(data) - len(data) % dtype.itemsize
+    samples = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+
+    if dtype.kind == 'i':
+        return np.multiply(samples, 1 / 32768.0, dtype=np.float32)
+    if dtype.itemsize != 4:
+        return samples.astype(np.float32)
+    return samples
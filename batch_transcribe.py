@@ -0,0 +1,195 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from whisper_models import WHISPER_CPP_MODELS, get_available_models, load_whisper_model
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.mp4', '.webm', '.ogg', '.opus', '.flac', '.aac', '.amr')
+
+# One model per worker process, loaded once by _init_worker
+_model = None
+_options = None
+
+
+def find_audio_files(inputs):
+    """Expand directories (recursively), globs and plain paths, sorted"""
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in names:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        files.add(os.path.abspath(os.path.join(root, name)))
+        else:
+            for path in glob.glob(item, recursive=True) or [item]:
+                if os.path.isfile(path):
+                    files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def load_manifest(path):
+    """Files already finished, keyed by path -> (size, mtime, model)"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line may be cut short by an interrupted run
+                continue
+            done[entry['file']] = (entry['size'], entry['mtime'], entry['model'])
+    return done
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_size, int(st.st_mtime)
+
+
+def format_srt_time(seconds):
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{ms:03d}"
+
+
+def to_srt(segments):
+    blocks = []
+    for i, segment in enumerate(segments, 1):
+        blocks.append(
+            f"{i}\n{format_srt_time(segment['start'])} --> {format_srt_time(segment['end'])}\n"
+            f"{segment['text']}\n"
+        )
+    return "\n".join(blocks)
+
+
+def _init_worker(model_name, device, compute_type, cpu_threads, options):
+    global _model, _options
+    _model = load_whisper_model(model_name, device, compute_type, cpu_threads=cpu_threads)
+    _options = options
+
+
+def _transcribe_file(path):
+    started = time.perf_counter()
+    segments, info = _model.transcribe(path, **_options)
+    segments = [
+        {'start': round(s.start, 2), 'end': round(s.end, 2), 'text': s.text.strip()}
+        for s in segments
+    ]
+    return {
+        'transcription': " ".join(s['text'] for s in segments),
+        'segments': segments,
+        'language': info.language,
+        'duration': round(info.duration, 2),
+        'processing_seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def output_name(path, inputs_root):
+    """Relative path of the input with separators flattened, for .srt files"""
+    rel = os.path.relpath(path, inputs_root) if inputs_root else os.path.basename(path)
+    return os.path.splitext(rel)[0].replace(os.sep, '__')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transkripsi banyak file audio sekaligus")
+    parser.add_argument('inputs', nargs='+', help="Folder, file, atau glob (mis. 'rekaman/**/*.mp3')")
+    parser.add_argument('--model', default='base', choices=sorted(WHISPER_CPP_MODELS))
+    parser.add_argument('--output', default='transcripts', help="Folder hasil (default: transcripts/)")
+    parser.add_argument('--format', nargs='+', default=['jsonl'], choices=['jsonl', 'srt'])
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument('--device', default=None, help="cpu atau cuda (default: otomatis)")
+    parser.add_argument('--compute-type', default=None)
+    parser.add_argument('--language', default='id')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--no-vad', action='store_true', help="Matikan VAD filter")
+    args = parser.parse_args()
+
+    if args.model not in get_available_models():
+        print(f"Model {args.model} tidak tersedia di folder models/")
+        print(f"Download dulu: python download_models.py {args.model}")
+        return 1
+
+    files = find_audio_files(args.inputs)
+    if not files:
+        print("Tidak ada file audio ditemukan")
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, 'manifest.jsonl')
+    results_path = os.path.join(args.output, 'results.jsonl')
+
+    # A file counts as done only if it has not changed since and was
+    # transcribed with the same model
+    finished = load_manifest(manifest_path)
+    todo = [
+        path for path in files
+        if finished.get(path) != (*file_signature(path), args.model)
+    ]
+    print(f"{len(files)} file ditemukan, {len(files) - len(todo)} sudah selesai, {len(todo)} diproses")
+    if not todo:
+        return 0
+
+    inputs_root = os.path.commonpath(files) if len(files) > 1 else os.path.dirname(files[0])
+    cpu_threads = max(1, (os.cpu_count() or 1) // args.processes)
+    options = {
+        'language': args.language,
+        'beam_size': args.beam_size,
+        'vad_filter': not args.no_vad
+    }
+    print(f"Model: {args.model}, {args.processes} proses x {cpu_threads} thread")
+
+    started = time.perf_counter()
+    failed = 0
+    with open(manifest_path, 'a', encoding='utf-8') as manifest, \
+            open(results_path, 'a', encoding='utf-8') as results, \
+            ProcessPoolExecutor(
+                max_workers=args.processes,
+                initializer=_init_worker,
+                initargs=(args.model, args.device, args.compute_type, cpu_threads, options)
+            ) as executor:
+        futures = {executor.submit(_transcribe_file, path): path for path in todo}
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[{i}/{len(todo)}] ✗ {path}: {e}")
+                    continue
+
+                size, mtime = file_signature(path)
+                results.write(json.dumps({'file': path, 'model': args.model, **result}, ensure_ascii=False) + "\n")
+                results.flush()
+                if 'srt' in args.format:
+                    srt_path = os.path.join(args.output, output_name(path, inputs_root) + '.srt')
+                    with open(srt_path, 'w', encoding='utf-8') as f:
+                        f.write(to_srt(result['segments']))
+
+                # The manifest is written last, so a crash before this line
+                # just means the file is done again on the next run
+                manifest.write(json.dumps({'file': path, 'size': size, 'mtime': mtime, 'model': args.model}) + "\n")
+                manifest.flush()
+                os.fsync(manifest.fileno())
+
+                rtf = result['processing_seconds'] / result['duration'] if result['duration'] else 0
+                print(f"[{i}/{len(todo)}] ✓ {os.path.basename(path)} ({result['duration']:.0f}s audio, RTF {rtf:.2f})")
+        except KeyboardInterrupt:
+            print("\nDihentikan. Jalankan perintah yang sama untuk melanjutkan.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            return 130
+
+    print(f"Selesai dalam {time.perf_counter() - started:.0f}s, {failed} gagal. Hasil di {args.output}/")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
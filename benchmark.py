@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_transcribe import find_audio_files
+from model_cache import get_process_rss
+from whisper_models import WHISPER_CPP_MODELS, get_available_models, load_whisper_model
+
+# Lower is better for these; throughput is the one where higher is better
+LOWER_IS_BETTER = ('load_seconds', 'rtf_median', 'rtf_p90', 'peak_rss_bytes')
+HIGHER_IS_BETTER = ('throughput',)
+RUN_KEY = ('model', 'compute_type', 'beam_size', 'cpu_threads', 'concurrency')
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, or None if unknown"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except Exception:
+        return get_process_rss()
+
+
+def load_corpus(paths):
+    """Decode every file once up front so decoding is not part of the timing"""
+    from faster_whisper.audio import decode_audio
+
+    return [(os.path.basename(path), decode_audio(path)) for path in paths]
+
+
+def corpus_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(case, paths, language, repeat):
+    """One matrix cell, run in a fresh process so load time and peak RSS
+    belong to this model and settings only"""
+    audio_files = load_corpus(paths)
+
+    started = time.perf_counter()
+    model = load_whisper_model(
+        case['model'], compute_type=case['compute_type'],
+        cpu_threads=case['cpu_threads'], num_workers=case['concurrency']
+    )
+    load_seconds = time.perf_counter() - started
+
+    # Greedy fallback disabled so every run decodes the same way
+    options = {'language': language, 'beam_size': case['beam_size'], 'temperature': 0.0, 'vad_filter': True}
+
+    def transcribe(audio):
+        file_started = time.perf_counter()
+        segments, _ = model.transcribe(audio, **options)
+        text = " ".join(s.text.strip() for s in segments)
+        return time.perf_counter() - file_started, text
+
+    # Warm-up, not measured
+    transcribe(audio_files[0][1][:16000 * 5])
+
+    total_audio = sum(len(audio) for _, audio in audio_files) / 16000
+    rtfs = []
+    texts = []
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(case['concurrency']) as executor:
+        for _ in range(repeat):
+            results = executor.map(transcribe, [audio for _, audio in audio_files])
+            texts = []
+            for (_, audio), (seconds, text) in zip(audio_files, results):
+                rtfs.append(seconds / (len(audio) / 16000))
+                texts.append(text)
+    wall_seconds = time.perf_counter() - wall_started
+
+    return {
+        **case,
+        'load_seconds': round(load_seconds, 3),
+        'rtf_median': round(statistics.median(rtfs), 4),
+        'rtf_p90': round(percentile(rtfs, 0.9), 4),
+        # Seconds of audio transcribed per wall-clock second, all workers together
+        'throughput': round(total_audio * repeat / wall_seconds, 3),
+        'peak_rss_bytes': peak_rss(),
+        # Changes when the output changes, e.g. after a quantization change
+        'transcript_sha256': hashlib.sha256("\n".join(texts).encode()).hexdigest()
+    }
+
+
+def environment():
+    info = {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+    for package in ('faster_whisper', 'ctranslate2'):
+        try:
+            info[package] = __import__(package).__version__
+        except Exception:
+            info[package] = None
+    return info
+
+
+def run_matrix(args):
+    available = get_available_models()
+    missing = [name for name in args.models if name not in available]
+    if missing:
+        print(f"Model {', '.join(missing)} tidak tersedia. Download dulu: python download_models.py {' '.join(missing)}")
+        return 1
+
+    paths = find_audio_files([args.corpus])
+    if not paths:
+        print(f"Tidak ada file audio di {args.corpus}")
+        return 1
+
+    cases = [
+        dict(zip(RUN_KEY, values))
+        for values in itertools.product(args.models, args.compute_types, args.beam_sizes, args.threads, args.concurrency)
+    ]
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'corpus': {
+            'path': os.path.abspath(args.corpus),
+            'files': [os.path.basename(path) for path in paths],
+            'sha256': corpus_fingerprint(paths)
+        },
+        'language': args.language,
+        'repeat': args.repeat,
+        'runs': []
+    }
+    print(f"{len(paths)} file, {len(cases)} kombinasi, {args.repeat}x ulang")
+
+    # spawn: every case starts from a clean interpreter, also on Linux
+    context = multiprocessing.get_context('spawn')
+    for i, case in enumerate(cases, 1):
+        label = ", ".join(f"{key}={case[key]}" for key in RUN_KEY)
+        with context.Pool(1) as pool:
+            try:
+                result = pool.apply(run_case, (case, paths, args.language, args.repeat))
+            except Exception as e:
+                print(f"[{i}/{len(cases)}] ✗ {label}: {e}")
+                report['runs'].append({**case, 'error': str(e)})
+                continue
+        report['runs'].append(result)
+        print(f"[{i}/{len(cases)}] {label}: load {result['load_seconds']:.1f}s, "
+              f"RTF {result['rtf_median']:.3f}, {result['throughput']:.1f}x, "
+              f"peak {(result['peak_rss_bytes'] or 0) / 1024 / 1024:.0f} MB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil di {args.output}")
+    return 0
+
+
+def compare(args):
+    """Print changes per matching run; exit 1 if any metric regressed past the threshold"""
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    if baseline['corpus']['sha256'] != candidate['corpus']['sha256']:
+        print("PERINGATAN: corpus berbeda, perbandingan tidak setara")
+
+    def index(report):
+        return {tuple(run[key] for key in RUN_KEY): run for run in report['runs'] if 'error' not in run}
+
+    before, after = index(baseline), index(candidate)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys(), key=str):
+        old, new = before[key], after[key]
+        changes = []
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if not old.get(metric) or new.get(metric) is None:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            worse = change > args.threshold if metric in LOWER_IS_BETTER else change < -args.threshold
+            if worse:
+                regressions += 1
+            changes.append(f"{metric} {change:+.1%}{' ✗' if worse else ''}")
+        if old.get('transcript_sha256') != new.get('transcript_sha256'):
+            changes.append("transkrip berubah")
+        print(f"{', '.join(str(v) for v in key)}: {'; '.join(changes)}")
+
+    for key in sorted(before.keys() - after.keys(), key=str):
+        print(f"{', '.join(str(v) for v in key)}: tidak ada di {args.candidate}")
+
+    print(f"{regressions} regresi (ambang {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model, compute type dan setting decode di mesin ini")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Jalankan matrix benchmark")
+    run_parser.add_argument('corpus', help="Folder audio yang tetap, dipakai di setiap run")
+    run_parser.add_argument('--models', nargs='+', default=['base'], choices=sorted(WHISPER_CPP_MODELS))
+    run_parser.add_argument('--compute-types', nargs='+', default=['int8', 'float32'])
+    run_parser.add_argument('--beam-sizes', nargs='+', type=int, default=[1, 5])
+    run_parser.add_argument('--threads', nargs='+', type=int, default=[os.cpu_count() or 1],
+                            help="CPU threads per worker")
+    run_parser.add_argument('--concurrency', nargs='+', type=int, default=[1],
+                            help="Transkripsi paralel (num_workers)")
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--language', default='id')
+    run_parser.add_argument('--output', default=os.path.join('benchmarks', time.strftime('%Y%m%d-%H%M%S') + '.json'))
+
+    compare_parser = commands.add_parser('compare', help="Bandingkan dua hasil benchmark")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="Perubahan relatif yang dihitung regresi (default 0.10)")
+    args = parser.parse_args()
+
+    return run_matrix(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from whisper_models import MODEL_DIR
+
+SYS_CPU_DIR = '/sys/devices/system/cpu'
+SYS_NODE_DIR = '/sys/devices/system/node'
+
+# Chosen layout, reused while the CPU layout and process count stay the same
+TUNING_PATH = os.path.join(MODEL_DIR, '.cpu_tuning.json')
+
+# Physical cores per replica we aim for; CTranslate2's Whisper decode gains
+# little from more intra-op threads, so more cores become more replicas
+TARGET_THREADS_PER_REPLICA = int(os.environ.get('WHISPER_TARGET_THREADS', '4'))
+
+
+def parse_cpulist(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus):
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def usable_cpus():
+    """CPUs this process may run on (taskset / cgroup cpusets included)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def physical_cores(cpus, sys_root=''):
+    """Group logical CPUs into physical cores, SMT siblings together"""
+    cores = {}
+    for cpu in cpus:
+        topology = f"{sys_root}{SYS_CPU_DIR}/cpu{cpu}/topology"
+        try:
+            key = (int(_read(f"{topology}/physical_package_id")), int(_read(f"{topology}/core_id")))
+        except (OSError, ValueError):
+            key = (-1, cpu)
+        cores.setdefault(key, []).append(cpu)
+    return sorted(cores.values())
+
+
+def read_topology(sys_root=''):
+    """NUMA nodes with the physical cores of each that this process can use.
+
+    Without /sys (macOS, Windows, some containers) everything is one node
+    and every logical CPU counts as a core.
+    """
+    allowed = set(usable_cpus())
+    node_dir = f"{sys_root}{SYS_NODE_DIR}"
+    try:
+        names = sorted((n for n in os.listdir(node_dir) if n.startswith('node') and n[4:].isdigit()),
+                       key=lambda n: int(n[4:]))
+    except OSError:
+        names = []
+
+    nodes = []
+    for name in names:
+        try:
+            cpus = [cpu for cpu in parse_cpulist(_read(os.path.join(node_dir, name, 'cpulist'))) if cpu in allowed]
+        except OSError:
+            continue
+        if cpus:
+            nodes.append({'node': int(name[4:]), 'cores': physical_cores(cpus, sys_root)})
+    if not nodes:
+        nodes = [{'node': 0, 'cores': physical_cores(sorted(allowed), sys_root)}]
+
+    return {
+        'logical_cpus': len(allowed),
+        'physical_cores': sum(len(node['cores']) for node in nodes),
+        'nodes': nodes
+    }
+
+
+def split_cores(nodes, processes):
+    """Core sets for `processes` server processes.
+
+    With no more processes than nodes each process gets whole nodes;
+    otherwise processes are spread over the nodes and share a node's cores
+    evenly, so no process spans two nodes.
+    """
+    if processes <= len(nodes):
+        return [
+            [core for node in nodes[i::processes] for core in node['cores']]
+            for i in range(processes)
+        ]
+    sets = []
+    for i in range(processes):
+        node = nodes[i % len(nodes)]
+        sharing = len(range(i % len(nodes), processes, len(nodes)))
+        index = i // len(nodes)
+        per_process = max(1, len(node['cores']) // sharing)
+        start = min(index * per_process, len(node['cores']) - per_process)
+        sets.append(node['cores'][start:start + per_process])
+    return sets
+
+
+def plan(topology, processes=1):
+    """Replicas (concurrent transcriptions) and threads per replica for each process.
+
+    Threads are counted in physical cores: SMT siblings add little to the
+    matrix multiplies and would oversubscribe the real cores. The top-level
+    replicas / threads_per_replica are the smallest over all processes,
+    because every process reads the same settings when it imports the app.
+    """
+    slots = []
+    for cores in split_cores(topology['nodes'], processes):
+        replicas = max(1, len(cores) // TARGET_THREADS_PER_REPLICA)
+        slots.append({
+            'cpus': format_cpulist(cpu for core in cores for cpu in core),
+            'physical_cores': len(cores),
+            'replicas': replicas,
+            'threads_per_replica': max(1, len(cores) // replicas)
+        })
+    return {
+        'processes': processes,
+        'replicas': min(slot['replicas'] for slot in slots),
+        'threads_per_replica': min(slot['threads_per_replica'] for slot in slots),
+        'slots': slots
+    }
+
+
+def fingerprint(topology):
+    return ';'.join(
+        f"{node['node']}:{format_cpulist(cpu for core in node['cores'] for cpu in core)}/{len(node['cores'])}"
+        for node in topology['nodes']
+    )
+
+
+def read_tuning(path=TUNING_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def tune(processes=1, path=TUNING_PATH, retune=False):
+    """Saved plan if it still matches this host and process count, else a new one.
+
+    The saved file may be edited by hand; it is kept until the CPU layout
+    or the number of processes changes.
+    """
+    topology = read_topology()
+    key = fingerprint(topology)
+    saved = read_tuning(path)
+    if (not retune and saved and saved.get('fingerprint') == key
+            and saved.get('processes') == processes):
+        return {**saved, 'source': 'saved'}
+
+    tuning = {
+        **plan(topology, processes),
+        'fingerprint': key,
+        'logical_cpus': topology['logical_cpus'],
+        'physical_cores': topology['physical_cores'],
+        'numa_nodes': len(topology['nodes']),
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(tuning, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"CPU tuning: gagal menyimpan: {e}")
+    print(f"CPU tuning: {tuning['physical_cores']} core, {tuning['numa_nodes']} NUMA node -> "
+          f"{processes} process x {tuning['replicas']} replica x {tuning['threads_per_replica']} thread")
+    return {**tuning, 'source': 'probed'}
+
+
+def pin_process(cpus):
+    """Restrict every thread of this process, existing and future, to `cpus`"""
+    if not hasattr(os, 'sched_setaffinity'):
+        print("CPU pinning tidak didukung di OS ini")
+        return
+    cpus = set(parse_cpulist(cpus) if isinstance(cpus, str) else cpus)
+    try:
+        thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            # Thread exited in the meantime
+            pass
+
+
+def current_affinity():
+    return format_cpulist(usable_cpus())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atur replica dan thread CTranslate2 sesuai topologi CPU")
+    parser.add_argument('--processes', type=int, default=1, help="Jumlah server process (lihat serve.py)")
+    parser.add_argument('--retune', action='store_true', help="Abaikan hasil tersimpan dan hitung ulang")
+    args = parser.parse_args()
+
+    topology = read_topology()
+    for node in topology['nodes']:
+        cpus = [cpu for core in node['cores'] for cpu in core]
+        print(f"NUMA node {node['node']}: {len(node['cores'])} core fisik, CPU {format_cpulist(cpus)}")
+    tuning = tune(args.processes, retune=args.retune)
+    for i, slot in enumerate(tuning['slots']):
+        print(f"  process {i}: CPU {slot['cpus']}, {slot['replicas']} replica x {slot['threads_per_replica']} thread")
+    print(f"Dipakai: {tuning['replicas']} replica x {tuning['threads_per_replica']} thread per process "
+          f"({tuning['source']}, {TUNING_PATH})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
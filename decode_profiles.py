@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+
+# Named decode settings, cheapest first. The settings are also part of the
+# result cache key.
+DECODE_PROFILES = {
+    # Greedy, no temperature fallback: short dictation clips
+    'fast': {'language': 'id', 'beam_size': 1, 'vad_filter': True, 'temperature': 0.0},
+    'balanced': {'language': 'id', 'beam_size': 3, 'vad_filter': True},
+    'accurate': {'language': 'id', 'beam_size': 5, 'vad_filter': True},
+}
+PROFILE_ORDER = ['fast', 'balanced', 'accurate']
+
+
+class AdaptiveDegrader:
+    """Step decode settings down while the server is saturated and back up
+    once it drains.
+
+    Levels go from 0 (as requested) through cheaper profiles, and the last
+    level also allows a smaller model that is already loaded. A step down
+    happens when queued jobs per worker exceed `high_load` or the p95 of
+    recent job latencies exceeds `p95_target`. A step up needs both below
+    their low marks. Only latencies from the last `window_seconds` count.
+    Changes are at least `hold_seconds` apart so the level does not flap.
+    """
+
+    def __init__(self, load_factor, p95_target, high_load=1.0, low_load=0.25,
+                 hold_seconds=10, window_seconds=60):
+        self.load_factor = load_factor
+        self.p95_target = p95_target
+        self.high_load = high_load
+        self.low_load = low_load
+        self.hold_seconds = hold_seconds
+        # Profiles plus one extra level that also steps the model down
+        self.max_level = len(PROFILE_ORDER)
+        self.level = 0
+        self._changed_at = 0.0
+        self.window_seconds = window_seconds
+        # (finished at, seconds)
+        self._latencies = deque()
+        self._lock = threading.Lock()
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def p95(self):
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._latencies and self._latencies[0][0] < cutoff:
+                self._latencies.popleft()
+            latencies = sorted(seconds for _, seconds in self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def update(self):
+        """Re-evaluate load and move at most one level; returns the level"""
+        load = self.load_factor()
+        p95 = self.p95()
+        now = time.monotonic()
+        with self._lock:
+            if now - self._changed_at < self.hold_seconds:
+                return self.level
+            overloaded = load > self.high_load or (p95 is not None and p95 > self.p95_target)
+            idle = load < self.low_load and (p95 is None or p95 < self.p95_target / 2)
+            if overloaded and self.level < self.max_level:
+                self.level += 1
+                self._changed_at = now
+                print(f"Adaptive: turun ke level {self.level} (beban {load:.2f}, p95 {p95 or 0:.1f}s)")
+            elif idle and self.level > 0:
+                self.level -= 1
+                self._changed_at = now
+                print(f"Adaptive: naik ke level {self.level}")
+            return self.level
+
+    def choose(self, profile):
+        """(profile, step_model_down) for a request that asked for `profile`"""
+        level = self.update()
+        index = PROFILE_ORDER.index(profile) - level
+        return PROFILE_ORDER[max(index, 0)], index < 0 and level >= self.max_level
+
+    def stats(self):
+        p95 = self.p95()
+        return {
+            'level': self.level,
+            'max_level': self.max_level,
+            'p95_seconds': round(p95, 2) if p95 is not None else None,
+            'p95_target_seconds': self.p95_target,
+            'load_factor': round(self.load_factor(), 2)
+        }
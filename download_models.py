@@ -1,10 +1,34 @@
+import argparse
+import hashlib
+import json
 import os
-import urllib.request
 import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+# Expected SHA-256 per file, sha256sum format ("<hex>  <filename>")
+CHECKSUMS_PATH = os.path.join(MODEL_DIR, 'SHA256SUMS')
+
+HF_BASE_URL = "https://huggingface.co/ggerganov/whisper.cpp/resolve/main"
+# Point at a mirror or a local stand-in server instead of Hugging Face
+BASE_URL = os.environ.get('WHISPER_DOWNLOAD_BASE_URL', HF_BASE_URL).rstrip('/')
+
+DEFAULT_CONNECTIONS = 4
+# Files smaller than this per connection are not split further
+MIN_PART_BYTES = 8 * 1024 * 1024
+BLOCK_BYTES = 1024 * 1024
+# Progress is made durable (fsync + sidecar) at most this often per part
+SYNC_BYTES = 16 * 1024 * 1024
+TIMEOUT_SECONDS = 30
+RETRIES = 5
+
 MODELS = {
     "tiny": {
         "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-tiny.bin",
@@ -56,53 +80,317 @@ MODELS = {
     }
 }
 
-def download_model(model_name):
-    if model_name not in MODELS:
-        print(f"Model {model_name} tidak tersedia!")
+
+class DownloadError(Exception):
+    """Raised when a download cannot be completed or fails verification"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirects are followed by hand so headers of every hop can be read
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def model_url(model_name):
+    return MODELS[model_name]["url"].replace(HF_BASE_URL, BASE_URL)
+
+
+def read_checksums():
+    checksums = {}
+    if os.path.exists(CHECKSUMS_PATH):
+        with open(CHECKSUMS_PATH, encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    checksums[parts[1].lstrip('*')] = parts[0].lower()
+    return checksums
+
+
+_checksums_lock = threading.Lock()
+
+
+def record_checksum(filename, sha256):
+    with _checksums_lock:
+        checksums = read_checksums()
+        checksums[filename] = sha256
+        tmp_path = f"{CHECKSUMS_PATH}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for name in sorted(checksums):
+                f.write(f"{checksums[name]}  {name}\n")
+        os.replace(tmp_path, CHECKSUMS_PATH)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def probe(url):
+    """Follow redirects and return (final_url, total_bytes, ranges_ok, sha256_hint, etag).
+
+    Hugging Face sends the LFS object's SHA-256 as X-Linked-Etag on the
+    redirect, before handing off to the CDN. etag is the final response's
+    ETag, for servers that send no hint. The final URL is usually signed
+    and short-lived, so it is only good for this run.
+    """
+    sha256_hint = None
+    for _ in range(10):
+        request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+        try:
+            response = _opener.open(request, timeout=TIMEOUT_SECONDS)
+        except urllib.error.HTTPError as e:
+            if e.code not in (301, 302, 303, 307, 308):
+                raise
+            etag = (e.headers.get('X-Linked-Etag') or '').strip('"').lower()
+            if len(etag) == 64:
+                sha256_hint = etag
+            url = urllib.parse.urljoin(url, e.headers['Location'])
+            continue
+        with response:
+            etag = response.headers.get('ETag')
+            if response.status == 206:
+                total = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+                return url, total, True, sha256_hint, etag
+            return url, int(response.headers.get('Content-Length') or 0), False, sha256_hint, etag
+    raise DownloadError(f"Terlalu banyak redirect: {url}")
+
+
+def split_parts(total, connections):
+    """[start, end] byte ranges (inclusive), one per connection"""
+    count = max(1, min(connections, total // MIN_PART_BYTES))
+    size = -(-total // count)
+    return [[start, min(start + size, total) - 1] for start in range(0, total, size)]
+
+
+class Download:
+    """One file fetched over several ranged connections into <file>.part.
+
+    Bytes fetched per part are kept in a <file>.part.json sidecar, written
+    only after the data is fsynced, so an interrupted download resumes
+    where it stopped instead of from zero. The sidecar names the file, its
+    size and its version (SHA-256 or ETag), never the URL: the CDN URL is
+    signed anew on every probe.
+    """
+
+    def __init__(self, model_name, connections):
+        self.model_name = model_name
+        self.connections = connections
+        self.filename = os.path.basename(MODELS[model_name]["url"])
+        self.path = os.path.join(MODEL_DIR, self.filename)
+        self.part_path = self.path + '.part'
+        self.state_path = self.part_path + '.json'
+        self.total = 0
+        self._lock = threading.Lock()
+        self._state = None
+
+    @property
+    def done_bytes(self):
+        with self._lock:
+            return sum(done for _, _, done in self._state['parts']) if self._state else 0
+
+    def _load_state(self, total, version):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if (state['file'] == self.filename and state['total'] == total and state['version'] == version
+                    and os.path.getsize(self.part_path) == total):
+                return state
+        except (OSError, ValueError, KeyError):
+            pass
+        with open(self.part_path, 'wb') as f:
+            f.truncate(total)
+        return {
+            'file': self.filename,
+            'total': total,
+            'version': version,
+            'parts': [[start, end, 0] for start, end in split_parts(total, self.connections)]
+        }
+
+    def _save_state(self):
+        with self._lock:
+            data = json.dumps(self._state)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+
+    def _fetch_part(self, url, index):
+        start, end, done = self._state['parts'][index]
+        for attempt in range(RETRIES):
+            if start + done > end:
+                return
+            try:
+                request = urllib.request.Request(url, headers={'Range': f'bytes={start + done}-{end}'})
+                with urllib.request.urlopen(request, timeout=TIMEOUT_SECONDS) as response, \
+                        open(self.part_path, 'r+b') as f:
+                    if response.status != 206:
+                        raise DownloadError("Server tidak mendukung download per bagian")
+                    f.seek(start + done)
+                    unsynced = 0
+                    while True:
+                        block = response.read(BLOCK_BYTES)
+                        if not block:
+                            break
+                        f.write(block)
+                        unsynced += len(block)
+                        if unsynced >= SYNC_BYTES:
+                            done = self._commit(f, index, done + unsynced)
+                            unsynced = 0
+                    done = self._commit(f, index, done + unsynced)
+                if start + done > end:
+                    return
+                raise DownloadError("Koneksi terputus")
+            except (OSError, DownloadError) as e:
+                if attempt == RETRIES - 1:
+                    raise DownloadError(f"Bagian {index + 1} gagal: {e}")
+                time.sleep(2 ** attempt)
+
+    def _commit(self, f, index, done):
+        f.flush()
+        os.fsync(f.fileno())
+        with self._lock:
+            self._state['parts'][index][2] = done
+        self._save_state()
+        return done
+
+    def _fetch_single(self, url):
+        # No range support: plain stream, restarted from zero on failure
+        self._state = {'file': self.filename, 'total': self.total, 'parts': [[0, max(self.total - 1, 0), 0]]}
+        with urllib.request.urlopen(url, timeout=TIMEOUT_SECONDS) as response, \
+                open(self.part_path, 'wb') as f:
+            while True:
+                block = response.read(BLOCK_BYTES)
+                if not block:
+                    break
+                f.write(block)
+                with self._lock:
+                    self._state['parts'][0][2] += len(block)
+
+    def run(self):
+        # Always fetch from the URL just probed; a saved one has expired
+        url, self.total, ranges_ok, sha256_hint, etag = probe(model_url(self.model_name))
+        expected = MODELS[self.model_name].get('sha256') or read_checksums().get(self.filename) or sha256_hint
+
+        if ranges_ok and self.total:
+            self._state = self._load_state(self.total, expected or etag)
+            with ThreadPoolExecutor(len(self._state['parts'])) as executor:
+                for future in [executor.submit(self._fetch_part, url, i) for i in range(len(self._state['parts']))]:
+                    future.result()
+        else:
+            self._fetch_single(url)
+
+        actual = sha256_file(self.part_path)
+        if expected and actual != expected:
+            os.remove(self.part_path)
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            raise DownloadError(f"Checksum tidak cocok (harusnya {expected[:12]}, dapat {actual[:12]}), file dihapus")
+
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        record_checksum(self.filename, actual)
+        return expected is not None
+
+
+def verify_model(model_name):
+    """Check a downloaded model against the checksum manifest"""
+    filename = os.path.basename(MODELS[model_name]["url"])
+    path = os.path.join(MODEL_DIR, filename)
+    expected = MODELS[model_name].get('sha256') or read_checksums().get(filename)
+    if not os.path.exists(path):
+        print(f"✗ {model_name}: belum didownload")
+        return False
+    if not expected:
+        print(f"? {model_name}: tidak ada checksum di {os.path.basename(CHECKSUMS_PATH)}")
+        return False
+    if sha256_file(path) != expected:
+        print(f"✗ {model_name}: checksum tidak cocok, download ulang dengan --force")
+        return False
+    print(f"✓ {model_name}: OK")
+    return True
+
+
+def download_models(model_names, parallel=2, connections=DEFAULT_CONNECTIONS, force=False):
+    """Download several models concurrently; returns True if all succeeded"""
+    unknown = [name for name in model_names if name not in MODELS]
+    if unknown:
+        print(f"Model {', '.join(unknown)} tidak tersedia!")
         print(f"Model tersedia: {', '.join(MODELS.keys())}")
         return False
-    
-    url = MODELS[model_name]["url"]
-    filename = os.path.basename(url)
-    filepath = os.path.join(MODEL_DIR, filename)
-    
-    if os.path.exists(filepath):
-        print(f"✓ Model {model_name} sudah ada di {filepath}")
+
+    downloads = []
+    for model_name in dict.fromkeys(model_names):
+        download = Download(model_name, connections)
+        if os.path.exists(download.path) and not force:
+            print(f"✓ Model {model_name} sudah ada di {download.path}")
+            continue
+        downloads.append(download)
+    if not downloads:
         return True
-    
-    print(f"Downloading {model_name} ({MODELS[model_name]['size']}) from HuggingFace")
-    print(f"URL: {url}")
-    print(f"Saving to: {filepath}")
-    print("Mohon tunggu, ini mungkin memakan waktu...")
+
+    print(f"Downloading {', '.join(d.model_name for d in downloads)} from {BASE_URL}")
+    print(f"Saving to: {MODEL_DIR}")
+    print("Mohon tunggu, ini mungkin memakan waktu... (Ctrl+C aman, jalankan lagi untuk melanjutkan)")
     print()
-    
-    try:
-        def progress_hook(count, block_size, total_size):
-            if total_size > 0:
-                percent = int(count * block_size * 100 / total_size)
-                downloaded_mb = count * block_size / (1024 * 1024)
-                total_mb = total_size / (1024 * 1024)
-                sys.stdout.write(f"\rProgress: {percent}% ({downloaded_mb:.1f} MB / {total_mb:.1f} MB)")
-                sys.stdout.flush()
-        
-        urllib.request.urlretrieve(url, filepath, reporthook=progress_hook)
-        print(f"\n✓ Model {model_name} berhasil didownload!")
-        print(f"✓ File tersimpan di: {filepath}")
-        return True
-    except Exception as e:
-        print(f"\n✗ Error downloading model: {e}")
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        return False
+
+    ok = True
+    with ThreadPoolExecutor(max(1, parallel)) as executor:
+        futures = {executor.submit(d.run): d for d in downloads}
+        while any(not f.done() for f in futures):
+            status = []
+            for d in downloads:
+                if d.total:
+                    status.append(f"{d.model_name} {d.done_bytes * 100 // d.total}%")
+            total_mb = sum(d.done_bytes for d in downloads) / (1024 * 1024)
+            sys.stdout.write(f"\rProgress: {' | '.join(status)} ({total_mb:.1f} MB)   ")
+            sys.stdout.flush()
+            time.sleep(0.5)
+        print()
+        for future, d in futures.items():
+            try:
+                verified = future.result()
+            except Exception as e:
+                ok = False
+                print(f"✗ Error downloading {d.model_name}: {e}")
+                continue
+            note = "checksum cocok" if verified else "checksum dicatat (tidak ada pembanding)"
+            print(f"✓ Model {d.model_name} berhasil didownload ({note})")
+            print(f"✓ File tersimpan di: {d.path}")
+    return ok
+
+
+def download_model(model_name):
+    return download_models([model_name])
 
 if __name__ == '__main__':
     print("="*70)
     print("WHISPER.CPP MODEL DOWNLOADER")
     print("="*70)
     
-    if len(sys.argv) > 1:
-        model_name = sys.argv[1].lower()
-        download_model(model_name)
+    parser = argparse.ArgumentParser(description="Download model whisper.cpp")
+    parser.add_argument('models', nargs='*', help="Satu atau lebih nama model")
+    parser.add_argument('--parallel', type=int, default=2, help="Model yang didownload bersamaan")
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS, help="Koneksi per file")
+    parser.add_argument('--force', action='store_true', help="Download ulang walau file sudah ada")
+    parser.add_argument('--verify', action='store_true', help="Hanya cek checksum file yang sudah ada")
+    args = parser.parse_args()
+
+    if args.verify:
+        names = [name.lower() for name in args.models] or [
+            name for name, info in MODELS.items()
+            if os.path.exists(os.path.join(MODEL_DIR, os.path.basename(info["url"])))
+        ]
+        sys.exit(0 if all([verify_model(name) for name in names]) else 1)
+    elif args.models:
+        ok = download_models([name.lower() for name in args.models], args.parallel, args.connections, args.force)
+        sys.exit(0 if ok else 1)
     else:
         print("\n📦 Model yang tersedia untuk download:\n")
         print("MULTILINGUAL (Support 99 bahasa termasuk Indonesia):")
@@ -126,6 +414,8 @@ if __name__ == '__main__':
         print("  python download_models.py base        ← Download 1 model")
         print("  python download_models.py small")
         print("  python download_models.py large-v2")
+        print("  python download_models.py base small   ← Beberapa model sekaligus")
+        print("  python download_models.py --verify     ← Cek checksum")
         print()
         print("💡 Tips:")
         print("  - Untuk mulai, download 'base' atau 'small'")
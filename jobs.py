@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+FINISHED_STATES = ('done', 'error')
+
+# Progress-only updates are written to the shared directory at most this often
+SHARED_WRITE_INTERVAL = 1.0
+
+
+class JobStore:
+    """Per-job status, progress and result, kept in memory.
+
+    Every update bumps the job's version and wakes waiters, which is what
+    the Server-Sent Events stream blocks on. Finished jobs are dropped
+    `ttl_seconds` after they finish.
+
+    With `shared_dir`, job snapshots are also written there so that other
+    server processes (see serve.py) can answer /api/jobs/<id> for jobs they
+    do not own.
+    """
+
+    def __init__(self, ttl_seconds, shared_dir=None):
+        self.ttl_seconds = ttl_seconds
+        self.shared_dir = shared_dir
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._last_shared_write = {}
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def create(self, **fields):
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'progress': 0,
+            'stage': 'Menunggu antrian...',
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+            'version': 0
+        }
+        job.update(fields)
+        with self._cond:
+            self._expire()
+            self._jobs[job['id']] = job
+            self._write_shared(job, force=True)
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            status = job['status']
+            job.update(fields)
+            if job['status'] in FINISHED_STATES and job['finished_at'] is None:
+                job['finished_at'] = time.time()
+            job['version'] += 1
+            self._write_shared(job, force=job['status'] != status)
+            self._cond.notify_all()
+
+    def get(self, job_id):
+        with self._cond:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._read_shared(job_id)
+
+    def wait(self, job_id, version, timeout):
+        """Block until the job changes past `version` or timeout expires"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while job_id in self._jobs:
+                job = self._jobs[job_id]
+                if job['version'] > version:
+                    return dict(job)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return dict(job)
+                self._cond.wait(remaining)
+
+        # Owned by another process: poll its snapshot
+        while True:
+            job = self._read_shared(job_id)
+            if job is None or job['version'] > version or time.monotonic() >= deadline:
+                return job
+            time.sleep(0.5)
+
+    def latest_active(self):
+        """The most recently created job that has not finished"""
+        with self._cond:
+            active = [j for j in self._jobs.values() if j['status'] not in FINISHED_STATES]
+            if not active:
+                return None
+            return dict(max(active, key=lambda j: j['created_at']))
+
+    def _shared_path(self, job_id):
+        return os.path.join(self.shared_dir, f"{job_id}.json")
+
+    def _write_shared(self, job, force):
+        if not self.shared_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_shared_write.get(job['id'], 0) < SHARED_WRITE_INTERVAL:
+            return
+        self._last_shared_write[job['id']] = now
+        path = self._shared_path(job['id'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Job store: gagal menulis {job['id']}: {e}")
+
+    def _read_shared(self, job_id):
+        if not self.shared_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(self._shared_path(job_id), encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job['finished_at'] is not None and job['finished_at'] < time.time() - self.ttl_seconds:
+            return None
+        return job
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._last_shared_write.pop(job_id, None)
+            if self.shared_dir:
+                try:
+                    os.unlink(self._shared_path(job_id))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
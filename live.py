@@ -0,0 +1,255 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Decode the window at most this often while audio keeps arriving
+STEP_SECONDS = 1.0
+# Trailing silence after speech that finalizes the text before it
+COMMIT_SILENCE_SECONDS = 0.6
+# Longest uncommitted window before text is finalized anyway
+MAX_WINDOW_SECONDS = 20.0
+# Tail of the finalized text passed as prompt for the next window
+PROMPT_CHARS = 200
+
+VAD_PARAMETERS = {'min_silence_duration_ms': 300, 'speech_pad_ms': 100}
+# Longest wait after stop for the decoder to finish the last bytes
+FINAL_DECODE_TIMEOUT = 10.0
+
+
+class _ArrivingBytes:
+    """File-like input for PyAV over bytes that are still arriving.
+
+    read() waits for more data instead of reporting end of file, until
+    close(). Bytes are dropped once read, so nothing accumulates.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def feed(self, data):
+        with self._cond:
+            if not self._closed:
+                self._buffer.extend(data)
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self, size=-1):
+        with self._cond:
+            while not self._buffer and not self._closed:
+                self._cond.wait()
+            if size is None or size < 0:
+                size = len(self._buffer)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+
+class StreamDecoder:
+    """Decode a MediaRecorder container while it is being uploaded.
+
+    One demuxer and decoder run on their own thread for the whole session
+    and block when they run out of input, so every byte is decoded once
+    however long the recording gets. Samples are resampled to 16 kHz mono
+    like faster_whisper.audio.decode_audio does.
+    """
+
+    def __init__(self):
+        self._input = _ArrivingBytes()
+        self._lock = threading.Lock()
+        self._samples = []
+        self._available = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name='live-decoder', daemon=True)
+        self._thread.start()
+
+    def feed(self, data):
+        self._input.feed(data)
+
+    def close(self, timeout=None):
+        """End of input; waits up to `timeout` for the last samples"""
+        self._input.close()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def available(self):
+        with self._lock:
+            return self._available
+
+    def take(self):
+        """Samples decoded since the last call"""
+        with self._lock:
+            samples, self._samples, self._available = self._samples, [], 0
+        if not samples:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(samples)
+
+    def _frames(self, container):
+        frames = container.decode(audio=0)
+        while True:
+            try:
+                yield next(frames)
+            except StopIteration:
+                return
+            except av_error().InvalidDataError:
+                # A damaged packet; keep going with the next one
+                continue
+
+    def _run(self):
+        import av
+
+        try:
+            resampler = av.audio.resampler.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+            with av.open(self._input, mode='r', metadata_errors='ignore') as container:
+                # None flushes the resampler at the end
+                for frame in itertools.chain(self._frames(container), [None]):
+                    if frame is not None:
+                        frame.pts = None
+                    for resampled in resampler.resample(frame):
+                        samples = resampled.to_ndarray().reshape(-1).astype(np.float32) / 32768.0
+                        with self._lock:
+                            self._samples.append(samples)
+                            self._available += len(samples)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Later feeds are dropped instead of piling up
+            self._input.close()
+
+
+def av_error():
+    import av
+
+    return av.error
+
+
+class LiveSession:
+    """Incremental transcription of a recording that is still in progress.
+
+    The client sends MediaRecorder timeslices. They only decode as one
+    stream, so a StreamDecoder decodes them as they arrive and each step
+    appends the new samples to the uncommitted window. Each step transcribes that window
+    with the finalized text as prompt; once VAD sees a pause after speech,
+    the segments before it are finalized and dropped from the window.
+
+    `window()` and `apply()` run on the connection thread, `decode()` on a
+    pool worker, so session state is only touched from one thread.
+    """
+
+    def __init__(self, model_name, language='id'):
+        self.model_name = model_name
+        self.language = language
+        self.decoder = None
+        self.audio = np.zeros(0, dtype=np.float32)
+        # Seconds of audio already finalized and dropped from self.audio
+        self.offset = 0.0
+        self.finals = []
+        self.last_step = 0.0
+
+    def feed(self, chunk):
+        if self.decoder is None:
+            self.decoder = StreamDecoder()
+        self.decoder.feed(chunk)
+
+    def ready(self):
+        return (self.decoder is not None and self.decoder.available() > 0
+                and time.monotonic() - self.last_step >= STEP_SECONDS)
+
+    def finish(self):
+        """No more audio is coming; wait for the decoder to drain"""
+        if self.decoder is not None and not self.decoder.close(FINAL_DECODE_TIMEOUT):
+            self.decoder.error = TimeoutError("Decode audio terlalu lama")
+
+    def close(self):
+        """Stop the decoder thread, e.g. when the client disconnects"""
+        if self.decoder is not None:
+            self.decoder.close(0)
+
+    def error(self):
+        """Message when the audio could not be decoded, else None"""
+        if self.decoder is None or self.decoder.error is None:
+            return None
+        return f"Audio tidak bisa di-decode: {self.decoder.error}"
+
+    def window(self):
+        """Audio to decode next and the prompt for it, or None if empty"""
+        self.last_step = time.monotonic()
+        if self.decoder is not None:
+            samples = self.decoder.take()
+            if len(samples):
+                self.audio = np.concatenate([self.audio, samples])
+        if not len(self.audio):
+            return None
+        prompt = " ".join(self.finals)[-PROMPT_CHARS:] or None
+        return self.audio, prompt
+
+    def decode(self, model, audio, prompt):
+        """Transcribe one window; runs on a pool worker"""
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        segments, _ = model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=1,
+            initial_prompt=prompt,
+            condition_on_previous_text=False
+        )
+        segments = [(s.start, s.end, s.text.strip()) for s in segments]
+        speech = get_speech_timestamps(audio, VadOptions(**VAD_PARAMETERS), sampling_rate=SAMPLE_RATE)
+        return segments, speech, len(audio) / SAMPLE_RATE
+
+    def apply(self, result, final=False):
+        """Commit finished text and return the messages for the client"""
+        segments, speech, window_seconds = result
+
+        commit_until = None
+        if final:
+            commit_until = window_seconds
+        elif speech and window_seconds - speech[-1]['end'] / SAMPLE_RATE >= COMMIT_SILENCE_SECONDS:
+            commit_until = speech[-1]['end'] / SAMPLE_RATE
+        elif not speech and window_seconds >= COMMIT_SILENCE_SECONDS:
+            # Nothing but silence so far
+            commit_until = window_seconds
+        elif window_seconds >= MAX_WINDOW_SECONDS:
+            commit_until = segments[-1][0] if len(segments) > 1 else window_seconds
+
+        messages = []
+        partial = segments
+        if commit_until is not None:
+            committed = [s for s in segments if final or s[1] <= commit_until + 0.01]
+            partial = segments[len(committed):]
+            if partial:
+                commit_until = min(commit_until, partial[0][0])
+            for start, end, text in committed:
+                if not text:
+                    continue
+                self.finals.append(text)
+                messages.append({
+                    'type': 'final',
+                    'start': round(self.offset + start, 2),
+                    'end': round(self.offset + end, 2),
+                    'text': text
+                })
+            cut = int(commit_until * SAMPLE_RATE)
+            self.audio = self.audio[cut:]
+            self.offset += cut / SAMPLE_RATE
+
+        if not final:
+            messages.append({
+                'type': 'partial',
+                'start': round(self.offset, 2),
+                'text': " ".join(s[2] for s in partial)
+            })
+        return messages
+
+    def text(self):
+        return " ".join(self.finals)
@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import CancelledError, wait, FIRST_COMPLETED
+
+from worker_pool import PoolFull
+
+SAMPLE_RATE = 16000
+
+
+def split_on_silence(audio, chunk_seconds):
+    """Split audio into (start, end) sample ranges of about chunk_seconds,
+    cutting in the middle of VAD silences so no word is split.
+
+    The result depends only on the audio, so it is the same on every run.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    speech = get_speech_timestamps(
+        audio,
+        # Speech without any pause is still cut at the chunk length
+        VadOptions(min_silence_duration_ms=500, max_speech_duration_s=chunk_seconds),
+        sampling_rate=SAMPLE_RATE
+    )
+    if not speech:
+        return []
+
+    target = int(chunk_seconds * SAMPLE_RATE)
+    chunks = []
+    start = 0
+    for current, following in zip(speech, speech[1:]):
+        if current['end'] - start >= target:
+            cut = (current['end'] + following['start']) // 2
+            chunks.append((start, cut))
+            start = cut
+    chunks.append((start, len(audio)))
+    return chunks
+
+
+def transcribe_chunked(audio, chunks, submit_chunk, parallelism, on_segment=None, on_progress=None,
+                       cancel_chunk=None, queue_timeout=120.0, cancelled=None):
+    """Transcribe chunks in parallel and stitch segments in order.
+
+    submit_chunk(chunk_audio) returns a Future of segment dicts with times
+    relative to the chunk. At most `parallelism` chunks are in flight;
+    segments are shifted to global time and passed to on_segment strictly
+    in chunk order, whatever order the chunks finish in.
+
+    The first failed chunk fails the whole call; the chunks still in
+    flight are given to cancel_chunk(future) (default Future.cancel) and
+    the rest are never submitted.
+
+    A full pool is waited out while none of the chunks are in flight, for
+    up to queue_timeout seconds, then PoolFull is raised. cancelled() is
+    checked while waiting; when it returns True, CancelledError is raised.
+    """
+    cancel_chunk = cancel_chunk or (lambda future: future.cancel())
+    waiting_since = None
+    results = {}
+    running = {}
+    next_chunk = 0
+    next_emit = 0
+    done_seconds = 0.0
+    total_seconds = len(audio) / SAMPLE_RATE
+    segments = []
+
+    while next_emit < len(chunks):
+        while next_chunk < len(chunks) and len(running) < parallelism:
+            start, end = chunks[next_chunk]
+            try:
+                future = submit_chunk(audio[start:end])
+            except PoolFull:
+                # Already admitted as one job; wait for room instead of failing
+                if running:
+                    break
+                if cancelled and cancelled():
+                    raise CancelledError()
+                waiting_since = waiting_since or time.monotonic()
+                if time.monotonic() - waiting_since >= queue_timeout:
+                    raise
+                time.sleep(0.2)
+                continue
+            running[future] = next_chunk
+            next_chunk += 1
+            waiting_since = None
+
+        finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in finished:
+            index = running.pop(future)
+            try:
+                results[index] = future.result()
+            except BaseException:
+                for sibling in running:
+                    cancel_chunk(sibling)
+                raise
+            start, end = chunks[index]
+            done_seconds += (end - start) / SAMPLE_RATE
+            if on_progress:
+                on_progress(done_seconds, total_seconds)
+
+        while next_emit in results:
+            offset = chunks[next_emit][0] / SAMPLE_RATE
+            for segment in results.pop(next_emit):
+                segment = {
+                    **segment,
+                    'start': round(segment['start'] + offset, 2),
+                    'end': round(segment['end'] + offset, 2)
+                }
+                segments.append(segment)
+                if on_segment:
+                    on_segment(segment)
+            next_emit += 1
+
+    return segments
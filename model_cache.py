@@ -0,0 +1,188 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import LOCK_WAIT_SECONDS, MODEL_LOAD_SECONDS
+
+
+def get_process_rss():
+    """Return resident memory of this process in bytes, or None if unknown"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+class ModelCache:
+    """Keep several loaded models resident, evicting least-recently-used ones
+    when the measured footprint exceeds the RAM budget.
+
+    Entries are keyed by (model_name, device, compute_type). A model that is
+    in use (see `use`) or pinned (see `pin`) is never evicted.
+    """
+
+    def __init__(self, loader, budget_bytes, size_hint=None, on_load=None):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        # Called with (model_name, compute_type) when no measurement exists yet
+        self.size_hint = size_hint
+        # Called with (key, footprint, load_seconds) after each load
+        self.on_load = on_load
+
+        self._lock = threading.Lock()
+        # Loads are serialized so RSS deltas belong to a single model; they
+        # are only trusted when no other model is running (see get)
+        self._load_lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Footprints survive eviction so a reload can make room up front
+        self._footprints = {}
+        self._pinned = set()
+
+    def _estimate(self, key):
+        if key in self._footprints:
+            return self._footprints[key]
+        if self.size_hint:
+            return self.size_hint(key[0], key[2]) or 0
+        return 0
+
+    def _evict_for(self, needed, keep=None):
+        """Evict unused LRU entries until `needed` extra bytes fit the budget"""
+        evicted = []
+        with self._lock:
+            total = sum(e['footprint'] for e in self._entries.values())
+            for key in list(self._entries):
+                if total + needed <= self.budget_bytes:
+                    break
+                entry = self._entries[key]
+                if key == keep or key in self._pinned or entry['users'] > 0:
+                    continue
+                del self._entries[key]
+                total -= entry['footprint']
+                evicted.append(key)
+
+        if evicted:
+            gc.collect()
+            for key in evicted:
+                print(f"Model cache: evicted {key[0]} ({key[1]}/{key[2]})")
+        return evicted
+
+    def get(self, model_name, device, compute_type):
+        """Return a resident model, loading it if needed"""
+        key = (model_name, device, compute_type)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                entry['last_used'] = time.time()
+                return entry['model']
+
+        wait_started = time.perf_counter()
+        with self._load_lock:
+            LOCK_WAIT_SECONDS.observe(time.perf_counter() - wait_started, lock='model_load')
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    self._entries.move_to_end(key)
+                    return entry['model']
+
+            self._evict_for(self._estimate(key))
+
+            # Transcriptions running meanwhile allocate too and would be
+            # counted as part of this model
+            with self._lock:
+                idle = not any(e['users'] for e in self._entries.values())
+            rss_before = get_process_rss() if idle else None
+            started = time.perf_counter()
+            model = self.loader(model_name, device=device, compute_type=compute_type)
+            load_seconds = time.perf_counter() - started
+            MODEL_LOAD_SECONDS.observe(load_seconds, model=model_name)
+            rss_after = get_process_rss() if rss_before is not None else None
+            with self._lock:
+                idle = idle and not any(e['users'] for e in self._entries.values())
+
+            if idle and rss_before is not None and rss_after is not None and rss_after > rss_before:
+                footprint = rss_after - rss_before
+                self._footprints[key] = footprint
+            else:
+                # Keeps an earlier measurement; otherwise the file size
+                footprint = self._estimate(key)
+            if self.on_load:
+                self.on_load(key, footprint, load_seconds)
+
+            with self._lock:
+                self._entries[key] = {
+                    'model': model,
+                    'footprint': footprint,
+                    'load_seconds': load_seconds,
+                    'last_used': time.time(),
+                    'users': 0
+                }
+            print(f"Model cache: loaded {model_name} in {load_seconds:.1f}s, "
+                  f"~{footprint / (1024**2):.0f} MB")
+
+            # The new model itself may push us over budget
+            self._evict_for(0, keep=key)
+
+        return model
+
+    @contextmanager
+    def use(self, model_name, device, compute_type):
+        """Get a model and protect it from eviction while the block runs"""
+        key = (model_name, device, compute_type)
+        while True:
+            model = self.get(model_name, device, compute_type)
+            with self._lock:
+                entry = self._entries.get(key)
+                # Evicted between get() and here; load again
+                if entry is not None and entry['model'] is model:
+                    entry['users'] += 1
+                    break
+        try:
+            yield model
+        finally:
+            with self._lock:
+                entry['users'] -= 1
+
+    def pin(self, model_name, device, compute_type):
+        """Exclude a model from eviction, e.g. the current default"""
+        with self._lock:
+            self._pinned.add((model_name, device, compute_type))
+
+    def unpin(self, model_name, device, compute_type):
+        with self._lock:
+            self._pinned.discard((model_name, device, compute_type))
+
+    def is_loaded(self, model_name, device, compute_type):
+        with self._lock:
+            return (model_name, device, compute_type) in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'used_bytes': sum(e['footprint'] for e in self._entries.values()),
+                'models': [
+                    {
+                        'model': key[0],
+                        'device': key[1],
+                        'compute_type': key[2],
+                        'footprint_bytes': e['footprint'],
+                        'load_seconds': round(e['load_seconds'], 2),
+                        'in_use': e['users'],
+                        'pinned': key in self._pinned
+                    }
+                    for key, e in self._entries.items()
+                ]
+            }
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from whisper_models import MODEL_DIR, WHISPER_CPP_MODELS, get_device_config
+
+# Converted CTranslate2 models: models/ct2/<model>/<compute_type>-v<STORE_VERSION>/
+STORE_DIR = os.path.join(MODEL_DIR, 'ct2')
+INDEX_PATH = os.path.join(STORE_DIR, 'index.json')
+
+# Bump when the conversion recipe changes; older directories are then ignored
+STORE_VERSION = 1
+
+# Without tokenizer.json next to the weights faster-whisper fetches it from the Hub
+COPY_FILES = ['tokenizer.json', 'preprocessor_config.json']
+
+COMPUTE_TYPES = ['int8', 'int8_float16', 'int8_float32', 'float16', 'float32']
+
+
+def hf_source(model_name):
+    """Hugging Face checkpoint a model is converted from"""
+    if model_name == 'large-v1':
+        return 'openai/whisper-large'
+    return f'openai/whisper-{model_name}'
+
+
+def store_path(model_name, compute_type, version=STORE_VERSION):
+    return os.path.join(STORE_DIR, model_name, f"{compute_type}-v{version}")
+
+
+def entry_path(entry):
+    # Kept relative in the index so the store can be copied to another machine
+    return store_path(entry['model'], entry['compute_type'], entry['store_version'])
+
+
+def read_index():
+    """Index entries keyed by '<model>/<compute_type>'"""
+    try:
+        with open(INDEX_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_index(index):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp_path = f"{INDEX_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def lookup(model_name, compute_type):
+    """Index entry of a usable converted model, or None.
+
+    Only the size is checked here so loading stays cheap; the full checksum
+    is checked by `python model_store.py verify`.
+    """
+    entry = read_index().get(f"{model_name}/{compute_type}")
+    if not entry or entry['store_version'] != STORE_VERSION:
+        return None
+    weights = os.path.join(entry_path(entry), 'model.bin')
+    try:
+        if os.path.getsize(weights) != entry['size']:
+            return None
+    except OSError:
+        return None
+    return entry
+
+
+def stored_models():
+    """Model names that have at least one usable converted copy"""
+    return sorted({
+        key.split('/')[0] for key, entry in read_index().items()
+        if entry['store_version'] == STORE_VERSION and os.path.isdir(entry_path(entry))
+    })
+
+
+def convert(model_name, compute_type, source=None, force=False):
+    """Convert and quantize one model into the store, once"""
+    entry = lookup(model_name, compute_type)
+    if entry and not force:
+        print(f"✓ {model_name} ({compute_type}) sudah ada di store")
+        return entry
+
+    try:
+        from ctranslate2.converters import TransformersConverter
+    except ImportError:
+        raise RuntimeError("Konversi butuh ctranslate2 dan transformers[torch]: pip install transformers[torch]")
+
+    source = source or hf_source(model_name)
+    output_dir = store_path(model_name, compute_type)
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+
+    print(f"Konversi {source} -> {output_dir} (quantization {compute_type})")
+    started = time.perf_counter()
+    converter = TransformersConverter(
+        source,
+        copy_files=COPY_FILES,
+        load_as_float16=compute_type in ('float16', 'int8_float16')
+    )
+    converter.convert(tmp_dir, quantization=compute_type, force=True)
+
+    # Swap in the finished directory only after the conversion succeeded
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+    weights = os.path.join(output_dir, 'model.bin')
+    entry = {
+        'model': model_name,
+        'compute_type': compute_type,
+        'store_version': STORE_VERSION,
+        'source': source,
+        'size': os.path.getsize(weights),
+        'sha256': sha256_file(weights),
+        'converted_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    index = read_index()
+    index[f"{model_name}/{compute_type}"] = entry
+    write_index(index)
+    print(f"✓ {model_name} ({compute_type}) selesai dalam {time.perf_counter() - started:.0f}s, "
+          f"{entry['size'] / 1024 / 1024:.0f} MB")
+    return entry
+
+
+def verify():
+    """Re-hash every stored model; returns the number of broken entries"""
+    broken = 0
+    for key, entry in sorted(read_index().items()):
+        path = entry_path(entry)
+        weights = os.path.join(path, 'model.bin')
+        missing = [name for name in COPY_FILES if not os.path.exists(os.path.join(path, name))]
+        if not os.path.exists(weights):
+            status = "model.bin hilang"
+        elif sha256_file(weights) != entry['sha256']:
+            status = "checksum tidak cocok"
+        elif missing:
+            status = f"file hilang: {', '.join(missing)}"
+        elif entry['store_version'] != STORE_VERSION:
+            status = f"versi store lama (v{entry['store_version']}), konversi ulang"
+        else:
+            print(f"✓ {key}")
+            continue
+        broken += 1
+        print(f"✗ {key}: {status}")
+    return broken
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simpan model CTranslate2 yang sudah dikonversi dan di-quantize")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = commands.add_parser('convert', help="Konversi model ke store (butuh internet sekali)")
+    convert_parser.add_argument('models', nargs='+', choices=sorted(WHISPER_CPP_MODELS))
+    convert_parser.add_argument('--compute-type', choices=COMPUTE_TYPES, default=None,
+                                help="Default: sesuai device (int8 di CPU, float16 di GPU)")
+    convert_parser.add_argument('--source', default=None,
+                                help="Checkpoint Hugging Face atau folder lokal (untuk satu model)")
+    convert_parser.add_argument('--force', action='store_true')
+
+    commands.add_parser('list', help="Tampilkan isi store")
+    commands.add_parser('verify', help="Cek checksum semua model di store")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        compute_type = args.compute_type or get_device_config()[1]
+        if args.source and len(args.models) > 1:
+            parser.error("--source hanya untuk satu model")
+        for model_name in args.models:
+            try:
+                convert(model_name, compute_type, source=args.source, force=args.force)
+            except Exception as e:
+                print(f"✗ {model_name}: {e}")
+                return 1
+        return 0
+
+    if args.command == 'list':
+        index = read_index()
+        if not index:
+            print("Store kosong. Konversi dulu: python model_store.py convert base")
+        for key, entry in sorted(index.items()):
+            print(f"{key:28s} {entry['size'] / 1024 / 1024:8.0f} MB  v{entry['store_version']}  "
+                  f"{entry['sha256'][:12]}  {entry['converted_at']}")
+        return 0
+
+    return 1 if verify() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
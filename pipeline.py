@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+from metrics import QUEUE_WAIT_SECONDS, STAGE_SECONDS
+from worker_pool import PoolFull
+
+
+class PreparePool:
+    """Worker threads for the CPU work in front of the model: decoding
+    uploads to 16 kHz arrays and finding the speech in them.
+
+    Runs next to the TranscriptionPool, so the next jobs are decoded and
+    VAD-filtered while the model is busy with the current one. The queue
+    is bounded; a full queue raises PoolFull instead of piling up audio.
+    """
+
+    def __init__(self, size, queue_size):
+        self.size = size
+        self.queue_size = queue_size
+        self._init_state()
+
+    def _init_state(self):
+        self._queue = queue.Queue(self.queue_size)
+        self._threads = []
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(target=self._worker, name=f"prepare-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return a Future with its result"""
+        future = Future()
+        try:
+            self._queue.put_nowait((fn, args, future, time.perf_counter()))
+        except queue.Full:
+            raise PoolFull(f"Antrian persiapan audio penuh ({self.queue_size} job)")
+        return future
+
+    def _worker(self):
+        while True:
+            fn, args, future, queued_at = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at, lane='prepare')
+            with self._lock:
+                self._busy += 1
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def stats(self):
+        with self._lock:
+            busy = self._busy
+        return {
+            'workers': self.size,
+            'busy': busy,
+            'queued': self._queue.qsize(),
+            'queue_size': self.queue_size
+        }
+
+
+class PreparedAudio:
+    """Audio as the model should see it, plus what is needed to map the
+    segment times back onto the original recording"""
+
+    def __init__(self, audio, duration, speech_chunks=None):
+        self.audio = audio
+        self.duration = duration
+        self.speech_chunks = speech_chunks
+
+    def restore(self, segments):
+        """Segments with times on the original timeline"""
+        if not self.speech_chunks:
+            return segments
+        from faster_whisper.transcribe import restore_speech_timestamps
+        return restore_speech_timestamps(segments, self.speech_chunks, SAMPLE_RATE)
+
+
+def prepare_audio(audio, options):
+    """Do what transcribe(vad_filter=True) does before the model: keep
+    only the speech. Pass the result with model_options(options)."""
+    duration = len(audio) / SAMPLE_RATE
+    if not options.get('vad_filter'):
+        return PreparedAudio(audio, duration)
+
+    from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+
+    with STAGE_SECONDS.time(stage='vad'):
+        vad_parameters = options.get('vad_parameters') or VadOptions()
+        if isinstance(vad_parameters, dict):
+            vad_parameters = VadOptions(**vad_parameters)
+        speech_chunks = get_speech_timestamps(audio, vad_parameters)
+        audio_chunks, _ = collect_chunks(audio, speech_chunks)
+        return PreparedAudio(np.concatenate(audio_chunks, axis=0), duration, speech_chunks)
+
+
+def model_options(options):
+    """transcribe() options for audio that already went through prepare_audio"""
+    options = dict(options, vad_filter=False)
+    options.pop('vad_parameters', None)
+    return options
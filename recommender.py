@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+
+# Lowest to highest quality. English-only variants are left out because
+# the app transcribes Indonesian.
+QUALITY_ORDER = ['tiny', 'base', 'small', 'medium', 'large-v1', 'large-v2', 'large-v3-turbo', 'large-v3']
+
+# Weight of a new RTF measurement in the running average
+RTF_SMOOTHING = 0.2
+
+
+class ModelProfiles:
+    """Footprint and real-time factor measured per model on this host.
+
+    Keyed by model, device and compute type, and kept on disk so the
+    recommender has numbers right after a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._profiles = json.load(f)
+        except (OSError, ValueError):
+            self._profiles = {}
+
+    @staticmethod
+    def _key(model_name, device, compute_type):
+        return f"{model_name}|{device}|{compute_type}"
+
+    def get(self, model_name, device, compute_type):
+        with self._lock:
+            profile = self._profiles.get(self._key(model_name, device, compute_type))
+            return dict(profile) if profile else None
+
+    def record_load(self, model_name, device, compute_type, footprint, load_seconds):
+        with self._lock:
+            profile = self._profiles.setdefault(self._key(model_name, device, compute_type), {})
+            profile.update(rss_bytes=footprint, load_seconds=round(load_seconds, 2), updated_at=time.time())
+            self._dirty = True
+
+    def record_rtf(self, model_name, device, compute_type, rtf):
+        with self._lock:
+            profile = self._profiles.setdefault(self._key(model_name, device, compute_type), {})
+            previous = profile.get('rtf')
+            profile['rtf'] = rtf if previous is None else previous + RTF_SMOOTHING * (rtf - previous)
+            profile['samples'] = profile.get('samples', 0) + 1
+            profile['updated_at'] = time.time()
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._profiles, indent=2, sort_keys=True)
+            self._dirty = False
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Profil model: gagal menyimpan: {e}")
+
+
+class Recommender:
+    """Pick the best-quality model that meets a real-time-factor target.
+
+    A model qualifies when its measured RTF, multiplied by the current
+    load (queued jobs per worker), stays within `target_rtf` and its
+    measured footprint fits in free memory. Models not measured yet get
+    an RTF scaled by file size from the nearest measured one. Until any
+    model has been measured, `fallback` decides.
+
+    The result is recomputed every `interval` seconds on a background
+    thread, so requests only read the last answer.
+    """
+
+    def __init__(self, profiles, device_config, available_models, size_hint, is_loaded,
+                 load_factor, free_memory, fallback, target_rtf, interval=30):
+        self.profiles = profiles
+        self.device_config = device_config
+        self.available_models = available_models
+        self.size_hint = size_hint
+        self.is_loaded = is_loaded
+        self.load_factor = load_factor
+        self.free_memory = free_memory
+        self.fallback = fallback
+        self.target_rtf = target_rtf
+        self.interval = interval
+        self._current = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _candidates(self, available, device, compute_type):
+        candidates = []
+        for model_name in QUALITY_ORDER:
+            if model_name not in available:
+                continue
+            profile = self.profiles.get(model_name, device, compute_type) or {}
+            candidates.append({
+                'model': model_name,
+                'size': self.size_hint(model_name) or 0,
+                'rtf': profile.get('rtf'),
+                'rtf_measured': profile.get('rtf') is not None,
+                'rss_bytes': profile.get('rss_bytes'),
+                'loaded': self.is_loaded(model_name, device, compute_type)
+            })
+
+        measured = [c for c in candidates if c['rtf_measured'] and c['size']]
+        for candidate in candidates:
+            if candidate['rtf'] is None and measured and candidate['size']:
+                # Decode cost grows roughly with the number of weights
+                nearest = min(measured, key=lambda c: abs(c['size'] - candidate['size']))
+                candidate['rtf'] = nearest['rtf'] * candidate['size'] / nearest['size']
+        return candidates, bool(measured)
+
+    def recompute(self):
+        device, compute_type = self.device_config()
+        available = self.available_models()
+        candidates, measured = self._candidates(available, device, compute_type)
+        load = self.load_factor()
+        free = self.free_memory()
+
+        if not measured:
+            model_name, reason = self.fallback(available)
+        else:
+            def fits(c):
+                if c['rtf'] is None or c['rtf'] * load > self.target_rtf:
+                    return False
+                needed = c['rss_bytes'] or c['size']
+                return c['loaded'] or free is None or needed <= free
+
+            suitable = [c for c in candidates if fits(c)]
+            if suitable:
+                best = suitable[-1]
+                source = 'terukur' if best['rtf_measured'] else 'perkiraan'
+                reason = (f"RTF {source} {best['rtf']:.2f} x beban {load:.1f} "
+                          f"memenuhi target {self.target_rtf}")
+            else:
+                best = min((c for c in candidates if c['rtf'] is not None), key=lambda c: c['rtf'])
+                reason = f"Tidak ada model yang memenuhi target RTF {self.target_rtf}, pilih yang tercepat"
+            model_name = best['model']
+
+        current = {
+            'model': model_name,
+            'reason': reason,
+            'target_rtf': self.target_rtf,
+            'load_factor': round(load, 2),
+            'available': available,
+            'candidates': [
+                {**c, 'rtf': round(c['rtf'], 3) if c['rtf'] is not None else None}
+                for c in candidates
+            ],
+            'computed_at': time.time()
+        }
+        with self._lock:
+            self._current = current
+        self.profiles.save()
+        return current
+
+    def current(self):
+        """Last recommendation, computed now if there is none yet"""
+        with self._lock:
+            current = self._current
+        return current or self.recompute()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.recompute()
+            except Exception as e:
+                print(f"Recommender: {e}")
+
+    def start(self):
+        """Start the background refresh; safe to call again, e.g. after fork"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='recommender', daemon=True)
+            self._thread.start()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ResultCache:
+    """Disk-backed LRU of transcription results, keyed by a hash of the
+    decoded audio and the settings that affect the output.
+
+    Each entry is one JSON file; recency is its mtime, so the LRU order
+    survives restarts. Entries older than `ttl_seconds` are treated as
+    missing, and the least recently used ones are deleted once the
+    directory grows past `max_bytes`.
+
+    `begin` also does single-flight: while a key is being computed, other
+    callers get the leader's Future instead of starting their own decode.
+    """
+
+    def __init__(self, directory, max_bytes, ttl_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        # key -> (size, mtime), oldest first
+        self._index = OrderedDict()
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                st = os.stat(os.path.join(directory, name))
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        for mtime, key, size in sorted(entries):
+            self._index[key] = (size, mtime)
+
+    @staticmethod
+    def audio_hash(audio):
+        return hashlib.sha256(audio.tobytes()).hexdigest()
+
+    @staticmethod
+    def make_key(audio_hash, settings):
+        # Takes the audio hash so callers that also need it hash the audio once
+        digest = hashlib.sha256(audio_hash.encode())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _unlink(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _read(self, key):
+        """(result, size) from disk, or (None, None) if missing, expired or
+        unreadable. Called without the lock."""
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None, None
+        if time.time() - st.st_mtime > self.ttl_seconds:
+            self._unlink(key)
+            return None, None
+        try:
+            with open(path, encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self._unlink(key)
+            return None, None
+        return result, st.st_size
+
+    def _write(self, key, result):
+        """Write the entry file and return its size. Called without the lock."""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _evict(self):
+        """Drop the oldest entries from the index until under max_bytes and
+        return their keys; the caller holds the lock and deletes the files"""
+        evicted = []
+        total = sum(size for size, _ in self._index.values())
+        while total > self.max_bytes and len(self._index) > 1:
+            oldest, (size, _) = self._index.popitem(last=False)
+            total -= size
+            evicted.append(oldest)
+        return evicted
+
+    def begin(self, key):
+        """Look up a key. Returns one of:
+
+        ('hit', result)        cached result
+        ('coalesced', future)  an identical request is running; wait on it
+        ('miss', None)         caller computes it, then calls complete() or abandon()
+
+        Only the bookkeeping holds the lock. The key is claimed before the
+        disk read, so identical requests arriving meanwhile coalesce on it.
+        """
+        with self._lock:
+            if key in self._inflight:
+                self.coalesced += 1
+                return 'coalesced', self._inflight[key]
+            leader = self._inflight[key] = Future()
+
+        result, size = self._read(key)
+
+        with self._lock:
+            if result is None:
+                # Stays claimed until complete() or abandon()
+                self.misses += 1
+                self._index.pop(key, None)
+                return 'miss', None
+            self.hits += 1
+            del self._inflight[key]
+            self._index[key] = (size, time.time())
+            self._index.move_to_end(key)
+        leader.set_result(result)
+        return 'hit', result
+
+    def complete(self, key, future):
+        """Done-callback for the leader's Future: store and release waiters"""
+        try:
+            result = future.result()
+        except BaseException as e:
+            self.abandon(key, e)
+            return
+
+        try:
+            size = self._write(key, result)
+        except OSError as e:
+            print(f"Result cache: gagal menyimpan {key[:12]}: {e}")
+            size = None
+
+        with self._lock:
+            # Released only now, so nobody misses while the file is written
+            waiter = self._inflight.pop(key)
+            evicted = []
+            if size is not None:
+                self._index[key] = (size, time.time())
+                self._index.move_to_end(key)
+                evicted = self._evict()
+        for old in evicted:
+            self._unlink(old)
+        waiter.set_result(result)
+
+    def abandon(self, key, error):
+        with self._lock:
+            waiter = self._inflight.pop(key)
+        waiter.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'entries': len(self._index),
+                'bytes': sum(size for size, _ in self._index.values()),
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+
+# Production server: gunicorn in front of the app.
+#
+# One process is the default and the recommended setup: its transcription
+# replicas (CTranslate2 num_workers) already use every core and share one
+# copy of the weights. Models are not preloaded in the master: fork() would
+# share the weight pages, but CTranslate2's thread pools do not survive it,
+# so each worker imports the app and loads its own models after fork. With
+# --processes N that costs N times the model RAM; WHISPER_MODEL_CACHE_MB is
+# split evenly between the processes. Restart without dropping requests with
+# `kill -HUP <master pid>`: new workers are forked and old ones finish what
+# they are doing (up to --graceful-timeout).
+
+if sys.platform == 'win32':
+    print("serve.py butuh gunicorn yang tidak jalan di Windows. Gunakan: python app.py")
+    sys.exit(1)
+
+from gunicorn.app.base import BaseApplication
+
+from cpu_topology import pin_process, tune
+
+
+class WhisperServer(BaseApplication):
+    def __init__(self, options, cpu_slots=None):
+        self.options = options
+        # Core set per worker process when pinning, else None
+        self.cpu_slots = cpu_slots
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('preload_app', False)
+        self.cfg.set('pre_fork', pre_fork)
+        self.cfg.set('post_worker_init', post_worker_init)
+
+    def load(self):
+        # Runs in each worker after fork
+        import app
+
+        return app.app
+
+
+def pre_fork(server, worker):
+    # In the master: give the new worker a core set no live worker holds.
+    # During a HUP old and new workers overlap, then slots are shared.
+    slots = server.app.cpu_slots
+    if slots:
+        taken = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+        worker.cpu_slot = next((i for i in range(len(slots)) if i not in taken), worker.age % len(slots))
+
+
+def post_worker_init(worker):
+    # The app is imported by now; pin its pool threads, then start loading
+    # the model so the loader and CTranslate2 threads inherit the pinning
+    import app
+
+    slots = worker.app.cpu_slots
+    if slots:
+        pin_process(slots[worker.cpu_slot]['cpus'])
+        print(f"Worker {worker.pid}: CPU {slots[worker.cpu_slot]['cpus']}")
+    app.start_background_loading()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jalankan server transkripsi untuk produksi (gunicorn)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Jumlah worker process (default: 1). Tiap process memuat model sendiri, "
+                             "jadi N process = N x RAM model")
+    parser.add_argument('--threads', type=int, default=8, help="Thread HTTP per process")
+    parser.add_argument('--timeout', type=int, default=300, help="Detik sebelum worker yang macet di-restart")
+    parser.add_argument('--graceful-timeout', type=int, default=120)
+    parser.add_argument('--pin-cpus', action='store_true', default=os.environ.get('WHISPER_PIN_CPUS') == '1',
+                        help="Kunci tiap worker process ke core (dan NUMA node) sendiri")
+    args = parser.parse_args()
+
+    # Split the cores between processes; app.py tunes replicas and threads
+    # for this many processes at import
+    os.environ['WHISPER_PROCESSES'] = str(args.processes)
+    tuning = tune(args.processes)
+    # Job status must be visible from whichever process gets the poll
+    os.environ.setdefault('WHISPER_JOBS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'jobs'))
+
+    print("="*60)
+    print(f"Server produksi: {args.processes} process x {args.threads} thread, "
+          f"{os.environ.get('WHISPER_WORKERS', tuning['replicas'])} transkripsi paralel per process")
+    if args.pin_cpus:
+        print("CPU: " + ", ".join(slot['cpus'] for slot in tuning['slots']))
+    budget_mb = int(os.environ.get('WHISPER_MODEL_CACHE_MB', '6144'))
+    print(f"Model dimuat di tiap process, cache {budget_mb // args.processes} MB per process")
+    print(f"Listening on http://{args.host}:{args.port}")
+    print("="*60)
+
+    WhisperServer({
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.processes,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': '-',
+    }, tuning['slots'] if args.pin_cpus else None).run()
+
+
+if __name__ == '__main__':
+    main()
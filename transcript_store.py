@@ -0,0 +1,244 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    job_id TEXT,
+    audio_sha256 TEXT,
+    model TEXT,
+    profile TEXT,
+    pass TEXT,
+    language TEXT,
+    duration REAL,
+    text TEXT NOT NULL,
+    segments TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_created_at ON transcripts (created_at);
+CREATE INDEX IF NOT EXISTS transcripts_audio ON transcripts (audio_sha256);
+-- External content: the text is stored once, in transcripts
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+    text, content='transcripts', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+COLUMNS = 'id, created_at, job_id, audio_sha256, model, profile, pass, language, duration'
+
+# Matching segments returned per search hit
+MAX_MATCHES = 10
+
+
+def fts_query(text):
+    """Turn user input into an FTS5 query that cannot be a syntax error.
+
+    Words must all occur; "quoted words" must occur as a phrase; a trailing
+    * matches a prefix. Returns (query, terms), or (None, []) when there
+    is nothing to search for.
+    """
+    parts = []
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text or ''):
+        words = re.findall(r'\w+', phrase or word)
+        if not words:
+            continue
+        prefix = '*' if not phrase and word.endswith('*') else ''
+        parts.append('"' + ' '.join(words) + '"' + prefix)
+        terms.append(' '.join(words).casefold())
+    return (' '.join(parts), terms) if parts else (None, [])
+
+
+class TranscriptStore:
+    """Searchable history of finished transcriptions, in SQLite with an
+    FTS5 index.
+
+    record() only queues the result; a writer thread inserts what has
+    queued up in one transaction per batch, so requests never wait on the
+    disk. A full queue drops the record instead of blocking.
+
+    created_at is taken inside the write transaction and never goes back,
+    so ids grow with time even with several server processes writing.
+    Search uses that: a time range becomes an id range and pages go by id,
+    newest first, which FTS5 and the primary key both serve without
+    sorting or OFFSET scans.
+    """
+
+    def __init__(self, path, batch_size=200, flush_seconds=1.0, queue_size=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+        self._init_state()
+
+    def _init_state(self):
+        self._queue = queue.Queue(self.queue_size)
+        self._local = threading.local()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+            self._thread.start()
+
+    def record(self, job_id, audio_sha256, result):
+        """Queue a finished result for storage; never blocks"""
+        try:
+            self._queue.put_nowait((job_id, audio_sha256, result))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Riwayat transkrip: antrian penuh, job {job_id} tidak disimpan")
+
+    def _run(self):
+        db = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(db, batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                self.dropped += len(batch)
+                print(f"Riwayat transkrip: gagal menyimpan {len(batch)} hasil: {e}")
+
+    def _write(self, db, batch):
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Under the write lock, so no other process can insert in between
+            last = db.execute('SELECT max(created_at) FROM transcripts').fetchone()[0] or 0.0
+            created_at = max(time.time(), last)
+            for job_id, audio_sha256, result in batch:
+                segments = [
+                    {'start': s['start'], 'end': s['end'], 'text': s['text']}
+                    for s in result.get('segments', [])
+                ]
+                cursor = db.execute(
+                    'INSERT INTO transcripts (created_at, job_id, audio_sha256, model, profile, pass, '
+                    'language, duration, text, segments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (created_at, job_id, audio_sha256, result.get('model_used'), result.get('profile'),
+                     result.get('pass'), result.get('language'), result.get('duration'),
+                     result.get('transcription', ''), json.dumps(segments, ensure_ascii=False))
+                )
+                db.execute('INSERT INTO transcripts_fts (rowid, text) VALUES (?, ?)',
+                           (cursor.lastrowid, result.get('transcription', '')))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _reader(self):
+        # One connection per thread, and never one inherited across fork()
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = self._local.db = self._connect()
+            self._local.pid = os.getpid()
+        return db
+
+    def _id_range(self, db, since, until):
+        """Lowest and highest id created within [since, until]"""
+        if since is None:
+            low = 1
+        else:
+            row = db.execute('SELECT id FROM transcripts WHERE created_at >= ? ORDER BY created_at LIMIT 1',
+                             (since,)).fetchone()
+            if row is None:
+                return None, None
+            low = row[0]
+        if until is None:
+            high = db.execute('SELECT max(id) FROM transcripts').fetchone()[0]
+        else:
+            row = db.execute('SELECT id FROM transcripts WHERE created_at <= ? ORDER BY created_at DESC LIMIT 1',
+                             (until,)).fetchone()
+            high = row[0] if row else None
+        if high is None or high < low:
+            return None, None
+        return low, high
+
+    def search(self, query=None, since=None, until=None, model=None, limit=20, cursor=None):
+        """One page of transcripts, newest first: (results, next_cursor).
+
+        query is keywords (see fts_query); since / until bound created_at
+        (epoch seconds); cursor is next_cursor from the previous page.
+        """
+        db = self._reader()
+        low, high = self._id_range(db, since, until)
+        if cursor is not None and high is not None:
+            high = min(high, cursor - 1)
+        if low is None or high < low:
+            return [], None
+
+        match, terms = fts_query(query)
+        model_filter = ' AND t.model = ?' if model else ''
+        model_params = [model] if model else []
+        if match:
+            rows = db.execute(
+                f"SELECT {', '.join('t.' + c for c in COLUMNS.split(', '))}, t.segments, "
+                "snippet(transcripts_fts, 0, '[', ']', '…', 16) "
+                "FROM transcripts_fts JOIN transcripts t ON t.id = transcripts_fts.rowid "
+                f"WHERE transcripts_fts MATCH ? AND transcripts_fts.rowid BETWEEN ? AND ?{model_filter} "
+                "ORDER BY transcripts_fts.rowid DESC LIMIT ?",
+                [match, low, high, *model_params, limit + 1]
+            ).fetchall()
+        else:
+            rows = db.execute(
+                f"SELECT {', '.join('t.' + c for c in COLUMNS.split(', '))}, t.segments, substr(t.text, 1, 200) "
+                f"FROM transcripts t WHERE t.id BETWEEN ? AND ?{model_filter} "
+                "ORDER BY t.id DESC LIMIT ?",
+                [low, high, *model_params, limit + 1]
+            ).fetchall()
+
+        results = []
+        for row in rows[:limit]:
+            item = dict(zip(COLUMNS.split(', '), row))
+            item['snippet'] = row[-1]
+            if terms:
+                segments = json.loads(row[-2])
+                item['matches'] = [
+                    s for s in segments
+                    if any(term in s['text'].casefold() for term in terms)
+                ][:MAX_MATCHES]
+            results.append(item)
+        next_cursor = results[-1]['id'] if len(rows) > limit else None
+        return results, next_cursor
+
+    def get(self, transcript_id):
+        row = self._reader().execute(
+            f"SELECT {COLUMNS}, text, segments FROM transcripts WHERE id = ?", (transcript_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        item = dict(zip(COLUMNS.split(', ') + ['text'], row))
+        item['segments'] = json.loads(row[-1])
+        return item
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'latest_id': self._reader().execute('SELECT max(id) FROM transcripts').fetchone()[0]
+        }
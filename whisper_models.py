@@ -0,0 +1,197 @@
+import functools
+import os
+
+# Set custom model directory
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+os.makedirs(MODEL_DIR, exist_ok=True)
+
+# Never touch the network when loading; models must come from model_store.py
+OFFLINE = os.environ.get('WHISPER_OFFLINE') == '1'
+
+# Model info for whisper.cpp
+WHISPER_CPP_MODELS = {
+    "tiny": {
+        "file": "ggml-tiny.bin",
+        "size": "75 MB",
+        "speed": "~32x",
+        "quality": "Rendah",
+        "ram": "~390 MB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-tiny.bin"
+    },
+    "tiny.en": {
+        "file": "ggml-tiny.en.bin",
+        "size": "75 MB",
+        "speed": "~32x",
+        "quality": "Rendah (English)",
+        "ram": "~390 MB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-tiny.en.bin"
+    },
+    "base": {
+        "file": "ggml-base.bin",
+        "size": "142 MB",
+        "speed": "~16x",
+        "quality": "Baik",
+        "ram": "~500 MB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.bin"
+    },
+    "base.en": {
+        "file": "ggml-base.en.bin",
+        "size": "142 MB",
+        "speed": "~16x",
+        "quality": "Baik (English)",
+        "ram": "~500 MB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-base.en.bin"
+    },
+    "small": {
+        "file": "ggml-small.bin",
+        "size": "466 MB",
+        "speed": "~6x",
+        "quality": "Bagus",
+        "ram": "~1 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.bin"
+    },
+    "small.en": {
+        "file": "ggml-small.en.bin",
+        "size": "466 MB",
+        "speed": "~6x",
+        "quality": "Bagus (English)",
+        "ram": "~1 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-small.en.bin"
+    },
+    "medium": {
+        "file": "ggml-medium.bin",
+        "size": "1.5 GB",
+        "speed": "~2x",
+        "quality": "Sangat Bagus",
+        "ram": "~2.6 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.bin"
+    },
+    "medium.en": {
+        "file": "ggml-medium.en.bin",
+        "size": "1.5 GB",
+        "speed": "~2x",
+        "quality": "Sangat Bagus (English)",
+        "ram": "~2.6 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-medium.en.bin"
+    },
+    "large-v1": {
+        "file": "ggml-large-v1.bin",
+        "size": "2.9 GB",
+        "speed": "~1x",
+        "quality": "Terbaik (v1)",
+        "ram": "~4.3 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v1.bin"
+    },
+    "large-v2": {
+        "file": "ggml-large-v2.bin",
+        "size": "2.9 GB",
+        "speed": "~1x",
+        "quality": "Terbaik (v2)",
+        "ram": "~4.3 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v2.bin"
+    },
+    "large-v3": {
+        "file": "ggml-large-v3.bin",
+        "size": "2.9 GB",
+        "speed": "~1x",
+        "quality": "Terbaik (v3)",
+        "ram": "~4.3 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v3.bin"
+    },
+    "large-v3-turbo": {
+        "file": "ggml-large-v3-turbo.bin",
+        "size": "1.6 GB",
+        "speed": "~2x",
+        "quality": "Terbaik (Turbo)",
+        "ram": "~3.0 GB",
+        "url": "https://huggingface.co/ggerganov/whisper.cpp/resolve/main/ggml-large-v3-turbo.bin"
+    }
+}
+
+def get_available_models():
+    """Check which models are available in models folder or the converted store"""
+    from model_store import stored_models
+
+    stored = stored_models()
+    available = []
+    for model_name, info in WHISPER_CPP_MODELS.items():
+        model_path = os.path.join(MODEL_DIR, info['file'])
+        if model_name in stored or os.path.exists(model_path):
+            available.append(model_name)
+    return available
+
+def get_model_file_size(model_name, compute_type=None):
+    """Size of the model file on disk, used before a footprint is measured"""
+    from model_store import lookup
+
+    entry = lookup(model_name, compute_type or get_device_config()[1])
+    if entry:
+        return entry['size']
+    model_info = WHISPER_CPP_MODELS.get(model_name)
+    if not model_info:
+        return 0
+    model_path = os.path.join(MODEL_DIR, model_info['file'])
+    return os.path.getsize(model_path) if os.path.exists(model_path) else 0
+
+@functools.lru_cache(maxsize=None)
+def has_cuda():
+    """Probe for a CUDA device through CTranslate2, without importing torch"""
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+def get_device_config():
+    """Determine default device and compute type"""
+    device = "cuda" if has_cuda() else "cpu"
+    compute_type = "float16" if device == "cuda" else "int8"
+    return device, compute_type
+
+def load_whisper_model(model_name, device=None, compute_type=None, cpu_threads=0, num_workers=1):
+    """Load whisper model using faster-whisper"""
+    # Imported here so that importing this module stays cheap
+    from faster_whisper import WhisperModel
+
+    from model_store import entry_path, lookup
+
+    model_info = WHISPER_CPP_MODELS.get(model_name)
+    if not model_info:
+        raise ValueError(f"Model {model_name} tidak dikenal")
+
+    # Determine device and compute type
+    default_device, default_compute_type = get_device_config()
+    device = device or default_device
+    compute_type = compute_type or default_compute_type
+
+    # Converted and quantized ahead of time: loads from disk as-is
+    stored = lookup(model_name, compute_type)
+    if stored:
+        model_path = entry_path(stored)
+    else:
+        model_path = os.path.join(MODEL_DIR, model_info['file'])
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model {model_info['file']} tidak ditemukan di folder models/")
+        if OFFLINE:
+            raise FileNotFoundError(
+                f"Model {model_name} ({compute_type}) belum ada di store. "
+                f"Jalankan: python model_store.py convert {model_name} --compute-type {compute_type}"
+            )
+        print(f"Tip: python model_store.py convert {model_name} untuk load lebih cepat tanpa internet")
+
+    print(f"Loading model from: {model_path}")
+    print(f"Device: {device}, Compute type: {compute_type}")
+    print(f"Workers: {num_workers}, CPU threads per worker: {cpu_threads or 'default'}")
+
+    model = WhisperModel(
+        # Without a store entry, faster-whisper resolves the size name itself
+        model_path if stored else model_name,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=num_workers,
+        download_root=MODEL_DIR,
+        local_files_only=bool(stored) or OFFLINE
+    )
+
+    return model
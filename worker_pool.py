@@ -0,0 +1,219 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from metrics import QUEUE_WAIT_SECONDS
+
+# Weight of a new run-time / cost observation in the Retry-After estimate
+COST_SMOOTHING = 0.2
+
+
+class PoolFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        # Seconds until the queue has likely drained enough to try again
+        self.retry_after = retry_after
+
+
+class TranscriptionPool:
+    """Run transcription jobs on N worker threads behind a bounded queue.
+
+    Each job is a callable taking the model it should run on. Models come
+    from the ModelCache and are loaded with `num_workers` equal to the pool
+    size, so CTranslate2 decodes the concurrent calls in parallel on shared
+    weights. A job keeps its model pinned until it finishes, which lets the
+    default model be swapped while older jobs drain.
+
+    Jobs are queued per lane ('batch' uploads, 'live' sessions) and workers
+    take from the lanes round-robin, so a backlog in one lane cannot hold
+    up the other.
+
+    Within a lane, each job has a cost (estimated processing seconds) and a
+    client. The next job is the one with the lowest
+    client virtual time + cost - aging_rate * seconds waited:
+    short jobs run first, clients that already got a lot of work wait
+    behind those that did not, and waiting long enough gets any job out.
+
+    Admission is bounded by job count and, optionally, by total queued
+    cost; a rejected submit raises PoolFull with a Retry-After estimate.
+
+    A job can come with a `ready` callable, e.g. while its audio is still
+    being prepared elsewhere; workers take ready jobs first so they do not
+    sit waiting on one that is not.
+    """
+
+    def __init__(self, model_cache, device_config, size, queue_size, max_queued_cost=None, aging_rate=1.0):
+        self.model_cache = model_cache
+        self.device_config = device_config
+        self.size = size
+        self.queue_size = queue_size
+        self.max_queued_cost = max_queued_cost
+        self.aging_rate = aging_rate
+        self._init_state()
+
+    def _init_state(self):
+        self._cond = threading.Condition()
+        self._lanes = OrderedDict()
+        self._queued = 0
+        self._queued_cost = 0.0
+        self._running = {}
+        self._threads = []
+        # Fair queueing: cost served per client, and the virtual time of
+        # the last dispatch that new clients start from
+        self._client_time = {}
+        self._virtual_clock = 0.0
+        # Measured seconds of run time per unit of estimated cost
+        self._cost_scale = 1.0
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(target=self._worker, name=f"transcribe-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _retry_after(self):
+        # Caller holds self._cond
+        return max(1, math.ceil(self._queued_cost * self._cost_scale / self.size))
+
+    def check_admission(self, cost=0.0):
+        """Raise PoolFull if a job of this cost would not be accepted now"""
+        with self._cond:
+            self._check_admission(cost)
+
+    def _check_admission(self, cost):
+        if self._queued >= self.queue_size:
+            raise PoolFull(f"Antrian transkripsi penuh ({self.queue_size} job)", self._retry_after())
+        # An empty queue takes any job, however large
+        if self.max_queued_cost and self._queued and self._queued_cost + cost > self.max_queued_cost:
+            raise PoolFull(f"Antrian transkripsi penuh (~{self._queued_cost:.0f}s pekerjaan menunggu)",
+                           self._retry_after())
+
+    def submit(self, model_name, fn, lane='batch', cost=0.0, client=None, ready=None):
+        """Queue fn(model) and return a Future with its result.
+
+        cost is the estimated processing time in seconds; client groups
+        jobs for fair scheduling; ready() tells whether fn can start
+        without waiting.
+        """
+        future = Future()
+        with self._cond:
+            self._check_admission(cost)
+            jobs = self._lanes.setdefault(lane, [])
+            if not any(job['client'] == client for lane_jobs in self._lanes.values() for job in lane_jobs):
+                # A client returning after idling gets no credit for the idle time
+                self._client_time[client] = max(self._client_time.get(client, 0.0), self._virtual_clock)
+            jobs.append({
+                'model_name': model_name,
+                'fn': fn,
+                'future': future,
+                'queued_at': time.perf_counter(),
+                'cost': cost,
+                'client': client,
+                'ready': ready
+            })
+            self._queued += 1
+            self._queued_cost += cost
+            self._cond.notify()
+        return future
+
+    def cancel(self, future):
+        """Cancel a job that has not started and take it off the queue.
+
+        Returns False when it is already running or done.
+        """
+        with self._cond:
+            for jobs in self._lanes.values():
+                index = next((i for i, job in enumerate(jobs) if job['future'] is future), None)
+                if index is not None:
+                    job = jobs.pop(index)
+                    self._queued -= 1
+                    self._queued_cost = self._queued_cost - job['cost'] if self._queued else 0.0
+                    break
+        # Outside the lock: cancel() runs the future's callbacks
+        return future.cancel()
+
+    def _pick(self, jobs):
+        now = time.perf_counter()
+        candidates = [i for i, job in enumerate(jobs) if job['ready'] is None or job['ready']()]
+        return min(
+            candidates or range(len(jobs)),
+            key=lambda i: self._client_time[jobs[i]['client']]
+            + max(0.0, jobs[i]['cost'] - self.aging_rate * (now - jobs[i]['queued_at']))
+        )
+
+    def _next_job(self):
+        with self._cond:
+            while not self._queued:
+                self._cond.wait()
+            for lane, jobs in self._lanes.items():
+                if jobs:
+                    # Served lane goes to the back of the rotation
+                    self._lanes.move_to_end(lane)
+                    job = jobs.pop(self._pick(jobs))
+                    self._queued -= 1
+                    # Reset when empty so float error cannot build up
+                    self._queued_cost = self._queued_cost - job['cost'] if self._queued else 0.0
+                    self._virtual_clock = self._client_time[job['client']]
+                    self._client_time[job['client']] += job['cost']
+                    self._forget_idle_clients()
+                    QUEUE_WAIT_SECONDS.observe(time.perf_counter() - job['queued_at'], lane=lane)
+                    return job
+
+    def _forget_idle_clients(self):
+        # Caller holds self._cond; keeps the table at the active clients
+        if len(self._client_time) <= 2 * self.queue_size:
+            return
+        waiting = {job['client'] for jobs in self._lanes.values() for job in jobs}
+        for client in list(self._client_time):
+            if client not in waiting:
+                del self._client_time[client]
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            model_name, future = job['model_name'], job['future']
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._cond:
+                self._running[model_name] = self._running.get(model_name, 0) + 1
+            started = time.perf_counter()
+            try:
+                with self.model_cache.use(model_name, *self.device_config()) as model:
+                    future.set_result(job['fn'](model))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[model_name] -= 1
+                    if not self._running[model_name]:
+                        del self._running[model_name]
+                    if job['cost'] > 0:
+                        scale = (time.perf_counter() - started) / job['cost']
+                        self._cost_scale += COST_SMOOTHING * (scale - self._cost_scale)
+
+    def in_flight(self, model_name=None):
+        """Jobs running or still queued, for one model or all"""
+        with self._cond:
+            queued = [job for jobs in self._lanes.values() for job in jobs]
+            if model_name is None:
+                return sum(self._running.values()) + len(queued)
+            return self._running.get(model_name, 0) + sum(job['model_name'] == model_name for job in queued)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.size,
+                'queued': self._queued,
+                'queue_size': self.queue_size,
+                'lanes': {lane: len(jobs) for lane, jobs in self._lanes.items()},
+                'running': dict(self._running),
+                'queued_cost_seconds': round(self._queued_cost, 1),
+                'max_queued_cost_seconds': self.max_queued_cost,
+                'clients_waiting': len({job['client'] for jobs in self._lanes.values() for job in jobs}),
+                'retry_after_seconds': self._retry_after() if self._queued else 0
+            }